@@ -0,0 +1,137 @@
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    """캐시 키용 질문 정규화 (유니코드 NFKC, 소문자, 공백 정리)"""
+    normalized = unicodedata.normalize("NFKC", question).lower()
+    return " ".join(normalized.split())
+
+
+class TTLCache:
+    """크기 제한 LRU + TTL 캐시
+
+    maxsize를 넘으면 가장 오래 사용되지 않은 항목부터 제거하고,
+    ttl(초)이 지난 항목은 조회 시 만료 처리합니다. ttl이 0 이하이면 만료하지 않습니다.
+    이벤트 루프 스레드에서만 접근한다고 가정하므로 별도 잠금은 두지 않습니다.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+class SemanticAnswerCache:
+    """질문 임베딩 유사도 기반 답변 캐시
+
+    같은 범위(scope: 문서 필터, top_k 등)와 같은 코퍼스 버전 안에서
+    코사인 유사도가 threshold 이상인 이전 질문이 있으면 그 답변을 재사용합니다.
+    """
+
+    def __init__(self, maxsize: int = 512, threshold: float = 0.95, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        # 항목: (정규화된 임베딩, scope, 코퍼스 버전, 값, 만료 시각)
+        self._entries: List[tuple] = []
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, embedding: Sequence[float], scope: Hashable, version: int) -> Optional[Any]:
+        now = time.monotonic()
+        self._entries = [
+            entry for entry in self._entries
+            if entry[2] == version and (entry[4] is None or entry[4] >= now)
+        ]
+        candidates = [entry for entry in self._entries if entry[1] == scope]
+        if not candidates:
+            self.misses += 1
+            return None
+
+        query = self._normalize(embedding)
+        similarities = np.stack([entry[0] for entry in candidates]) @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return candidates[best][3]
+
+    def store(self, embedding: Sequence[float], scope: Hashable, version: int, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        self._entries.append((self._normalize(embedding), scope, version, value, expires_at))
+        if len(self._entries) > self.maxsize:
+            del self._entries[:len(self._entries) - self.maxsize]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -0,0 +1,53 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 문서 추가 리스너: (문서 ID, 파일명, 청크 목록)
+# 각 청크는 id, chunk_index, content, metadata, embedding(numpy 배열, 임베딩 실패 시 None) 키를 가진 dict
+AddedListener = Callable[[str, str, List[Dict[str, Any]]], None]
+# 문서 삭제 리스너: (문서 ID)
+DeletedListener = Callable[[str], None]
+
+
+class CorpusEvents:
+    """문서 코퍼스 변경 알림
+
+    문서가 커밋되거나 삭제될 때마다 코퍼스 버전을 올리고 등록된 리스너를 호출합니다.
+    캐시 무효화나 메모리 인덱스 갱신처럼 코퍼스에 의존하는 구성 요소가 구독합니다.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._added_listeners: List[AddedListener] = []
+        self._deleted_listeners: List[DeletedListener] = []
+
+    def subscribe(
+        self,
+        on_added: Optional[AddedListener] = None,
+        on_deleted: Optional[DeletedListener] = None
+    ) -> None:
+        if on_added is not None:
+            self._added_listeners.append(on_added)
+        if on_deleted is not None:
+            self._deleted_listeners.append(on_deleted)
+
+    def documents_added(self, document_id: str, filename: str, chunks: List[Dict[str, Any]]) -> None:
+        self.version += 1
+        for listener in self._added_listeners:
+            try:
+                listener(document_id, filename, chunks)
+            except Exception as e:
+                logger.error(f"문서 추가 알림 처리 중 오류 발생: {e}")
+
+    def document_deleted(self, document_id: str) -> None:
+        self.version += 1
+        for listener in self._deleted_listeners:
+            try:
+                listener(document_id)
+            except Exception as e:
+                logger.error(f"문서 삭제 알림 처리 중 오류 발생: {e}")
+
+
+# 프로세스 전역 코퍼스 이벤트
+corpus_events = CorpusEvents()
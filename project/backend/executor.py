@@ -0,0 +1,71 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# CPU 작업용 워커 풀 설정
+# - EXECUTOR_WORKERS: 스레드 풀 크기 (임베딩, PDF 로딩 등 모델/객체를 공유해야 하는 작업)
+# - PROCESS_WORKERS: 프로세스 풀 크기 (OCR처럼 pickle 가능한 순수 함수 작업)
+# - CPU_EXECUTOR: 프로세스 풀 작업을 실제로 프로세스에서 돌릴지 여부 (thread | process)
+CPU_COUNT = os.cpu_count() or 1
+EXECUTOR_WORKERS = int(os.getenv("EXECUTOR_WORKERS", str(min(32, CPU_COUNT + 4))))
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", str(CPU_COUNT)))
+CPU_EXECUTOR = os.getenv("CPU_EXECUTOR", "process").lower()
+
+_thread_executor: Optional[ThreadPoolExecutor] = None
+_process_executor: Optional[Executor] = None
+
+
+def get_thread_executor() -> ThreadPoolExecutor:
+    """공유 스레드 풀 반환 (최초 호출 시 생성)"""
+    global _thread_executor
+    if _thread_executor is None:
+        _thread_executor = ThreadPoolExecutor(
+            max_workers=EXECUTOR_WORKERS,
+            thread_name_prefix="cpu-worker"
+        )
+        logger.info(f"스레드 풀 생성: {EXECUTOR_WORKERS}개 워커")
+    return _thread_executor
+
+
+def get_process_executor() -> Executor:
+    """공유 프로세스 풀 반환 (CPU_EXECUTOR=thread이면 스레드 풀로 대체)"""
+    global _process_executor
+    if _process_executor is None:
+        if CPU_EXECUTOR == "process":
+            # 스레드 풀과 DB/HTTP 연결을 가진 서버 프로세스를 fork하지 않도록 forkserver로 워커 생성
+            _process_executor = ProcessPoolExecutor(
+                max_workers=PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("forkserver")
+            )
+            logger.info(f"프로세스 풀 생성: {PROCESS_WORKERS}개 워커")
+        else:
+            _process_executor = ThreadPoolExecutor(
+                max_workers=PROCESS_WORKERS,
+                thread_name_prefix="cpu-process-fallback"
+            )
+            logger.info(f"CPU_EXECUTOR={CPU_EXECUTOR}: 프로세스 풀 대신 스레드 풀 사용 ({PROCESS_WORKERS}개 워커)")
+    return _process_executor
+
+
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """블로킹 함수를 스레드 풀에서 실행하여 이벤트 루프를 막지 않도록 함"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_thread_executor(), partial(func, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    """워커 풀 종료 (애플리케이션 종료 시 호출)"""
+    global _thread_executor, _process_executor
+    if _thread_executor is not None:
+        _thread_executor.shutdown(wait=False, cancel_futures=True)
+        _thread_executor = None
+    if _process_executor is not None:
+        _process_executor.shutdown(wait=False, cancel_futures=True)
+        _process_executor = None
+    logger.info("워커 풀 종료 완료")
@@ -0,0 +1,224 @@
+import os
+import json
+import uuid
+import shutil
+import asyncio
+import logging
+from typing import BinaryIO, List, Optional
+
+from sqlalchemy import text
+
+from database import async_session
+from executor import run_blocking
+from models import JobStatus
+from pdf_processor import PDFProcessor
+
+logger = logging.getLogger(__name__)
+
+# 수집 작업 설정
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+INGESTION_QUEUE_SIZE = int(os.getenv("INGESTION_QUEUE_SIZE", "1000"))
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+
+
+class JobQueueFullError(Exception):
+    """작업 대기열이 가득 찬 경우"""
+
+
+class IngestionJobManager:
+    """PDF 수집 작업 관리자
+
+    업로드된 파일을 UPLOAD_DIR에 보관하고 ingestion_jobs 테이블에 작업을 기록한 뒤,
+    제한된 수의 워커가 프로세스 내 대기열에서 작업을 꺼내 처리합니다.
+    서버가 재시작되면 완료되지 않은 작업을 테이블에서 다시 읽어 대기열에 넣습니다.
+    """
+
+    def __init__(self, pdf_processor: PDFProcessor, workers: int = INGESTION_WORKERS):
+        self.pdf_processor = pdf_processor
+        self.workers = workers
+        self.upload_dir = UPLOAD_DIR
+        self._queue: Optional[asyncio.Queue] = None
+        # 파일 저장/DB 등록 중인 제출이 미리 확보한 대기열 자리 수
+        self._reserved = 0
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """워커 시작 및 미완료 작업 복구"""
+        os.makedirs(self.upload_dir, exist_ok=True)
+        self._queue = asyncio.Queue(maxsize=INGESTION_QUEUE_SIZE)
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        logger.info(f"수집 작업 워커 {self.workers}개 시작")
+        await self._recover_jobs()
+
+    async def stop(self) -> None:
+        """워커 종료 (처리 중이던 작업은 다음 시작 시 복구됨)"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        logger.info("수집 작업 워커 종료")
+
+    async def submit(self, file_obj: BinaryIO, filename: str) -> str:
+        """업로드 파일을 보관하고 작업 등록 후 작업 ID 반환"""
+        if self._queue is None:
+            raise RuntimeError("수집 작업 관리자가 시작되지 않았습니다.")
+        # 파일 저장과 DB 등록을 기다리는 동안 다른 제출이 자리를 차지하지 않도록 먼저 확보
+        if self._queue.qsize() + self._reserved >= self._queue.maxsize:
+            raise JobQueueFullError("수집 작업 대기열이 가득 찼습니다. 잠시 후 다시 시도해주세요.")
+
+        job_id = str(uuid.uuid4())
+        file_path = os.path.join(self.upload_dir, f"{job_id}.pdf")
+        self._reserved += 1
+        try:
+            try:
+                await run_blocking(self._save_file, file_obj, file_path)
+                async with async_session() as db:
+                    await db.execute(
+                        text("""
+                            INSERT INTO ingestion_jobs (id, filename, file_path)
+                            VALUES (:id, :filename, :file_path)
+                        """),
+                        {"id": job_id, "filename": filename, "file_path": file_path}
+                    )
+                    await db.commit()
+            except BaseException:
+                # 등록되지 않은 작업의 파일은 남기지 않음
+                try:
+                    os.unlink(file_path)
+                except OSError:
+                    pass
+                raise
+            # 확보한 자리가 있으므로 실패하지 않음
+            self._queue.put_nowait((job_id, file_path, filename))
+        finally:
+            self._reserved -= 1
+        logger.info(f"수집 작업 등록: {job_id} ({filename})")
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[JobStatus]:
+        """작업 상태 조회"""
+        async with async_session() as db:
+            result = await db.execute(
+                text("""
+                    SELECT id, filename, status, stage, progress, document_id,
+                           result, error, created_at, updated_at
+                    FROM ingestion_jobs
+                    WHERE id = :id
+                """),
+                {"id": job_id}
+            )
+            row = result.fetchone()
+
+        if not row:
+            return None
+
+        return JobStatus(
+            id=str(row.id),
+            filename=row.filename,
+            status=row.status,
+            stage=row.stage,
+            progress=row.progress,
+            document_id=str(row.document_id) if row.document_id else None,
+            result=row.result,
+            error=row.error,
+            created_at=row.created_at,
+            updated_at=row.updated_at
+        )
+
+    @staticmethod
+    def _save_file(file_obj: BinaryIO, file_path: str) -> None:
+        with open(file_path, "wb") as out_file:
+            shutil.copyfileobj(file_obj, out_file)
+
+    async def _recover_jobs(self) -> None:
+        """재시작 전에 끝나지 않은 작업을 다시 대기열에 넣음"""
+        async with async_session() as db:
+            result = await db.execute(
+                text("""
+                    SELECT id, filename, file_path
+                    FROM ingestion_jobs
+                    WHERE status IN ('queued', 'running')
+                    ORDER BY created_at
+                """)
+            )
+            pending = result.fetchall()
+
+        recovered = 0
+        for row in pending:
+            job_id = str(row.id)
+            if not os.path.exists(row.file_path):
+                await self._update_job(job_id, status="failed", stage="failed", error="업로드 파일을 찾을 수 없습니다.")
+                continue
+            if self._queue.full():
+                logger.warning(f"대기열이 가득 차 작업 {job_id}을(를) 복구하지 못했습니다.")
+                continue
+            await self._update_job(job_id, status="queued", stage="queued", progress=0)
+            self._queue.put_nowait((job_id, row.file_path, row.filename))
+            recovered += 1
+
+        if recovered:
+            logger.info(f"미완료 수집 작업 {recovered}개 복구")
+
+    async def _worker(self, worker_id: int) -> None:
+        """대기열에서 작업을 꺼내 처리"""
+        while True:
+            job_id, file_path, filename = await self._queue.get()
+            try:
+                await self._run_job(job_id, file_path, filename)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"워커 {worker_id}: 작업 {job_id} 처리 중 예상치 못한 오류: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str, file_path: str, filename: str) -> None:
+        """단일 작업 실행"""
+        await self._update_job(job_id, status="running", stage="starting", progress=0)
+
+        async def report_progress(stage: str, percent: float) -> None:
+            await self._update_job(job_id, stage=stage, progress=percent)
+
+        try:
+            async with async_session() as db:
+                result = await self.pdf_processor.process_pdf(
+                    file_path, filename, db, progress_callback=report_progress
+                )
+            await self._update_job(
+                job_id,
+                status="completed",
+                stage="completed",
+                progress=100,
+                document_id=result["document_id"],
+                result=result
+            )
+            logger.info(f"수집 작업 완료: {job_id} ({filename})")
+        except asyncio.CancelledError:
+            # 종료 중 취소된 작업은 파일을 남겨 두어 재시작 시 복구
+            raise
+        except Exception as e:
+            await self._update_job(job_id, status="failed", stage="failed", error=str(e))
+            logger.error(f"수집 작업 실패: {job_id} ({filename}): {e}")
+
+        try:
+            os.unlink(file_path)
+        except OSError:
+            pass
+
+    async def _update_job(self, job_id: str, **fields) -> None:
+        """작업 행 갱신"""
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        assignments = ", ".join(f"{column} = :{column}" for column in fields)
+        async with async_session() as db:
+            await db.execute(
+                text(f"""
+                    UPDATE ingestion_jobs
+                    SET {assignments}, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = :id
+                """),
+                {"id": job_id, **fields}
+            )
+            await db.commit()
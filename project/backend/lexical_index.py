@@ -0,0 +1,212 @@
+import os
+import re
+import math
+import time
+import heapq
+import asyncio
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+from database import async_session
+from executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# BM25 파라미터
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+_TOKEN_PATTERN = re.compile(r"[0-9a-z]+|[가-힣]+")
+
+
+def tokenize(content: str) -> List[str]:
+    """한국어를 고려한 토큰화
+
+    영문/숫자는 단어 단위로, 한글은 어절 전체와 글자 바이그램을 함께 색인합니다.
+    바이그램 덕분에 조사가 붙은 어절("콜센터에")이나 띄어쓰기가 다른 상품명도 부분 일치합니다.
+    """
+    normalized = unicodedata.normalize("NFKC", content).lower()
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(normalized):
+        tokens.append(token)
+        if len(token) > 2 and "가" <= token[0] <= "힣":
+            tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return tokens
+
+
+class BM25Index:
+    """document_chunks.content에 대한 프로세스 내 BM25 역색인
+
+    InMemoryVectorIndex와 마찬가지로 DB에서 구성한 뒤 corpus_events로 점진 갱신합니다.
+    갱신은 순서대로 워커 스레드에서 실행되며, 토큰화와 용어별 postings 준비는 잠금 밖에서 하고
+    검색이 함께 잡는 잠금은 준비된 postings를 병합하는 동안만 잡습니다.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: List[int] = []
+        self._records: List[Optional[Dict[str, Any]]] = []
+        self._row_terms: List[List[str]] = []
+        self._document_rows: Dict[str, List[int]] = {}
+        self._total_length = 0
+        self._alive_count = 0
+        self._lock = threading.Lock()
+        self._update_task: Optional[asyncio.Task] = None
+
+    async def build(self) -> None:
+        """DB의 모든 청크로 색인 구성"""
+        start_time = time.time()
+        async with async_session() as db:
+            result = await db.stream(text("""
+                SELECT dc.id, dc.document_id, dc.chunk_index, dc.content, dc.metadata, d.filename
+                FROM document_chunks dc
+                JOIN documents d ON dc.document_id = d.id
+            """))
+            async for partition in result.partitions(5000):
+                await run_blocking(self._add_records, [
+                    {
+                        "id": str(row.id),
+                        "document_id": str(row.document_id),
+                        "chunk_index": row.chunk_index,
+                        "content": row.content,
+                        "metadata": row.metadata,
+                        "filename": row.filename
+                    }
+                    for row in partition
+                ])
+        self.ready = True
+        logger.info(f"BM25 색인 준비 완료: {self._alive_count}개 청크, {len(self._postings)}개 용어 ({time.time() - start_time:.2f}초)")
+
+    def _add_records(self, records: List[Dict[str, Any]]) -> None:
+        """청크 색인 (워커 스레드에서 한 번에 하나의 갱신만 실행)"""
+        first_row = len(self._records)
+        new_postings: Dict[str, Dict[int, int]] = {}
+        lengths = []
+        for offset, record in enumerate(records):
+            term_counts = Counter(tokenize(record["content"]))
+            for term, count in term_counts.items():
+                new_postings.setdefault(term, {})[first_row + offset] = count
+            lengths.append(sum(term_counts.values()))
+            self._row_terms.append(list(term_counts))
+            self._document_rows.setdefault(record["document_id"], []).append(first_row + offset)
+
+        with self._lock:
+            for term, rows in new_postings.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    self._postings[term] = rows
+                else:
+                    postings.update(rows)
+            self._records.extend(records)
+            self._lengths.extend(lengths)
+            self._total_length += sum(lengths)
+            self._alive_count += len(records)
+
+    def _remove_records(self, document_id: str) -> None:
+        """문서의 청크를 색인에서 제거 (워커 스레드에서 한 번에 하나의 갱신만 실행)"""
+        rows = self._document_rows.pop(document_id, [])
+        if not rows:
+            return
+        removed_rows: Dict[str, List[int]] = {}
+        for row in rows:
+            for term in self._row_terms[row]:
+                removed_rows.setdefault(term, []).append(row)
+            self._row_terms[row] = []
+        removed_length = sum(self._lengths[row] for row in rows)
+
+        with self._lock:
+            for term, term_rows in removed_rows.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                for row in term_rows:
+                    postings.pop(row, None)
+                if not postings:
+                    del self._postings[term]
+            for row in rows:
+                self._records[row] = None
+            self._total_length -= removed_length
+            self._alive_count -= len(rows)
+
+    def _schedule_update(self, update: Callable[..., None], *args: Any) -> None:
+        """색인 갱신을 워커 스레드에서 실행하도록 예약 (이전 갱신이 끝난 뒤 순서대로 실행)"""
+        previous = self._update_task
+
+        async def run():
+            if previous is not None and not previous.done():
+                await asyncio.gather(previous, return_exceptions=True)
+            try:
+                await run_blocking(update, *args)
+            except Exception as e:
+                logger.error(f"BM25 색인 갱신 실패: {e}")
+
+        self._update_task = asyncio.get_running_loop().create_task(run())
+
+    def add_document(self, document_id: str, filename: str, chunks: List[Dict[str, Any]]) -> None:
+        """업로드된 문서의 청크 색인 (corpus_events 리스너)"""
+        if not self.ready:
+            return
+        self._schedule_update(self._add_records, [
+            {
+                "id": chunk["id"],
+                "document_id": document_id,
+                "chunk_index": chunk["chunk_index"],
+                "content": chunk["content"],
+                "metadata": chunk["metadata"],
+                "filename": filename
+            }
+            for chunk in chunks
+        ])
+
+    def remove_document(self, document_id: str) -> None:
+        """삭제된 문서의 청크를 색인에서 제거 (corpus_events 리스너)"""
+        if not self.ready:
+            return
+        self._schedule_update(self._remove_records, document_id)
+
+    def search(self, query: str, top_k: int, document_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """BM25 점수 상위 top_k개 청크 (lexical_score 포함)"""
+        query_terms = set(tokenize(query))
+        allowed = set(document_ids) if document_ids else None
+        with self._lock:
+            if self._alive_count == 0:
+                return []
+
+            average_length = self._total_length / self._alive_count
+            scores: Dict[int, float] = {}
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (self._alive_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for row, count in postings.items():
+                    length_norm = 1 - BM25_B + BM25_B * self._lengths[row] / average_length
+                    scores[row] = scores.get(row, 0.0) + idf * count * (BM25_K1 + 1) / (count + BM25_K1 * length_norm)
+
+            # 삭제된 행(None)은 postings에서 빠지지만, 필터와 결과 구성에서도 한 번 더 제외
+            records = self._records
+            scores = {
+                row: score for row, score in scores.items()
+                if records[row] is not None and (allowed is None or records[row]["document_id"] in allowed)
+            }
+            return [
+                {**records[row], "lexical_score": score}
+                for row, score in heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "rows": self._alive_count,
+            "terms": len(self._postings)
+        }
+
+
+# 프로세스 전역 BM25 색인
+lexical_index = BM25Index()
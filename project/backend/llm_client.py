@@ -1,9 +1,11 @@
 import os
 import httpx
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 import json
-from sentence_transformers import SentenceTransformer
+import numpy as np
+
+from model_registry import model_registry, resolve_embedding_model_path
 
 logger = logging.getLogger(__name__)
 
@@ -14,47 +16,144 @@ class InternalLLMClient:
         self.base_url = os.getenv("LLM_API_URL", "http://10.231.255.37:11434")
         self.model = os.getenv("LLM_MODEL", "gemma3:27b-it-q4_0")
         self.timeout = 120.0  # LLM 응답 대기 시간
+        self.embedding_batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
         
-        # 로컬 임베딩 모델 (CPU에서 동작, 가벼운 모델 사용)
-        # 폐쇄망 환경에서 미리 다운로드한 모델 사용
-        default_model_path = "/app/paraphrase-MiniLM-L3-v2" if os.path.exists("/app") else "paraphrase-MiniLM-L3-v2"
-        embedding_model_path = os.getenv("LOCAL_EMBEDDING_MODEL", default_model_path)
+        # LLM 서버 연결 풀 설정 (keep-alive로 요청마다 TCP 연결을 새로 맺지 않음)
+        self.http_limits = httpx.Limits(
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10")),
+            keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+        )
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._requests_total = 0
+        self._requests_in_flight = 0
+        self._requests_failed = 0
         
-        # 절대 경로로 변환 (상대 경로 시작 문자 제거)
-        if embedding_model_path.startswith("./"):
-            embedding_model_path = embedding_model_path[2:]
-            
-        self.embedding_model = SentenceTransformer(embedding_model_path)
-        logger.info(f"로컬 임베딩 모델 로드 완료: {embedding_model_path}")
+        # 로컬 임베딩 모델 (CPU에서 동작, 가벼운 모델 사용)
+        # 모델은 프로세스 전역 레지스트리에서 한 번만 로드되어 모든 클라이언트가 공유
+        self.embedding_model_path = resolve_embedding_model_path()
         
+    @property
+    def embedding_model(self):
+        """공유 임베딩 모델 (최초 접근 시 로드)"""
+        return model_registry.get_embedding_model(self.embedding_model_path)
+    
+    def preload_models(self) -> None:
+        """임베딩 모델 미리 로드 (시작 시 워커 스레드에서 호출)"""
+        self.embedding_model
+    
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """공유 HTTP 클라이언트 반환 (최초 호출 시 연결 풀과 함께 생성)"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=self.http_limits,
+                headers={"Content-Type": "application/json"}
+            )
+        return self._http_client
+    
+    async def aclose(self) -> None:
+        """HTTP 연결 풀 종료 (애플리케이션 종료 시 호출)"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+            logger.info("LLM HTTP 연결 풀 종료")
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """LLM 서버 연결 풀 통계"""
+        stats = {
+            "max_connections": self.http_limits.max_connections,
+            "max_keepalive_connections": self.http_limits.max_keepalive_connections,
+            "keepalive_expiry": self.http_limits.keepalive_expiry,
+            "requests_total": self._requests_total,
+            "requests_in_flight": self._requests_in_flight,
+            "requests_failed": self._requests_failed,
+            "connections": 0,
+            "idle_connections": 0
+        }
+        # httpx는 공개 API로 풀 상태를 노출하지 않으므로 httpcore 풀을 직접 확인
+        pool = getattr(getattr(self._http_client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            stats["connections"] = len(connections)
+            stats["idle_connections"] = sum(1 for conn in connections if conn.is_idle())
+        return stats
+    
     async def chat_completion(
         self, 
         messages: List[Dict[str, str]], 
         temperature: float = 0.0
     ) -> str:
         """채팅 완성 요청"""
+        self._requests_total += 1
+        self._requests_in_flight += 1
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/api/chat",
-                    json={
-                        "model": self.model,
-                        "messages": messages,
-                        "stream": False,
-                        "options": {
-                            "temperature": temperature
-                        }
-                    },
-                    headers={"Content-Type": "application/json"}
-                )
+            response = await self._get_http_client().post(
+                "/api/chat",
+                json={
+                    "model": self.model,
+                    "messages": messages,
+                    "stream": False,
+                    "options": {
+                        "temperature": temperature
+                    }
+                }
+            )
+            response.raise_for_status()
+            
+            result = response.json()
+            return result["message"]["content"]
+                
+        except Exception as e:
+            self._requests_failed += 1
+            logger.error(f"LLM API 호출 중 오류 발생: {e}")
+            raise Exception(f"LLM API 호출 실패: {str(e)}")
+        finally:
+            self._requests_in_flight -= 1
+    
+    async def chat_completion_stream(
+        self, 
+        messages: List[Dict[str, str]], 
+        temperature: float = 0.0
+    ) -> AsyncIterator[str]:
+        """채팅 완성 스트리밍 요청 (Ollama 스트리밍 모드, 생성되는 토큰 조각을 순서대로 반환)"""
+        self._requests_total += 1
+        self._requests_in_flight += 1
+        try:
+            async with self._get_http_client().stream(
+                "POST",
+                "/api/chat",
+                json={
+                    "model": self.model,
+                    "messages": messages,
+                    "stream": True,
+                    "options": {
+                        "temperature": temperature
+                    }
+                }
+            ) as response:
                 response.raise_for_status()
                 
-                result = response.json()
-                return result["message"]["content"]
+                # Ollama는 줄 단위 JSON(NDJSON)으로 응답 조각을 전송
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise Exception(chunk["error"])
+                    content = chunk.get("message", {}).get("content", "")
+                    if content:
+                        yield content
+                    if chunk.get("done"):
+                        break
                 
         except Exception as e:
-            logger.error(f"LLM API 호출 중 오류 발생: {e}")
+            self._requests_failed += 1
+            logger.error(f"LLM 스트리밍 API 호출 중 오류 발생: {e}")
             raise Exception(f"LLM API 호출 실패: {str(e)}")
+        finally:
+            self._requests_in_flight -= 1
     
     def get_embedding(self, text: str) -> List[float]:
         """로컬에서 텍스트 임베딩 생성 (CPU 사용)"""
@@ -69,6 +168,74 @@ class InternalLLMClient:
             logger.warning("임베딩 생성 실패, 더미 벡터 사용")
             return [0.0] * 384  # paraphrase-MiniLM-L3-v2의 기본 차원
 
+    def get_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """여러 텍스트를 마이크로 배치 단위로 한 번에 임베딩 (CPU 사용)
+
+        반환값은 (len(texts), 차원) 모양의 float32 numpy 배열입니다.
+        """
+        batch_size = batch_size or self.embedding_batch_size
+        if not texts:
+            dimension = self.embedding_model.get_sentence_embedding_dimension() or 384
+            return np.zeros((0, dimension), dtype=np.float32)
+
+        try:
+            embeddings = self.embedding_model.encode(
+                texts,
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            return np.asarray(embeddings, dtype=np.float32)
+
+        except Exception as e:
+            logger.error(f"로컬 배치 임베딩 생성 중 오류 발생: {e}")
+            # 배치 실패 시 청크별로 재시도 (실패한 청크는 더미 벡터)
+            logger.warning("배치 임베딩 실패, 청크별 임베딩으로 재시도")
+            return np.asarray([self.get_embedding(text) for text in texts], dtype=np.float32)
+
+    def format_messages_for_query_expansion(self, question: str, count: int) -> List[Dict[str, str]]:
+        """질의 확장을 위한 메시지 포맷팅 (같은 의미의 다른 표현을 한 줄에 하나씩)"""
+        system_prompt = f"""당신은 문서 검색을 돕는 AI입니다. 사용자의 질문을 같은 의미를 유지하면서 다른 표현으로 {count}개 바꿔 써 주세요.
+
+**작성 지침:**
+1. 동의어, 다른 용어 표기(영문/한국어), 더 구체적인 표현을 활용하세요
+2. 한 줄에 질문 하나만 쓰고 번호나 설명은 붙이지 마세요
+3. 원래 질문은 다시 쓰지 마세요"""
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": question}
+        ]
+
+    def format_messages_for_retrieval_check(self, question: str) -> List[Dict[str, str]]:
+        """문서 검색 필요 여부 판단을 위한 메시지 포맷팅 (Y 또는 N 한 글자로 답변)"""
+        system_prompt = """당신은 사용자의 질문을 분석하여 문서 검색이 필요한지 여부를 판단하는 역할을 합니다.
+다음과 같은 경우에는 문서 검색이 필요합니다:
+- 사실 기반 정보, 특정 데이터나 수치를 요구하는 질문
+- 업로드된 문서의 내용에 관한 질문
+
+다음과 같은 경우에는 문서 검색이 필요하지 않습니다:
+- 일반적인 대화나 인사, 감사 표현
+- AI 자신이나 서비스 사용법에 대한 질문
+
+문서 검색이 필요하면 Y, 필요하지 않으면 N 한 글자로만 답하세요."""
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": question}
+        ]
+
+    def format_messages_for_chat(self, question: str) -> List[Dict[str, str]]:
+        """문서 검색 없이 답하는 대화(인사 등)를 위한 메시지 포맷팅"""
+        system_prompt = """당신은 업로드된 PDF 문서를 바탕으로 질문에 답하는 문서 분석 AI입니다.
+사용자의 인사나 서비스에 대한 질문에 한국어로 짧고 친절하게 답하세요.
+문서 내용에 대한 정보는 지어내지 말고, 궁금한 내용을 구체적으로 질문해 달라고 안내하세요."""
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": question}
+        ]
+
     def format_messages_for_qa(self, context: str, question: str) -> List[Dict[str, str]]:
         """QA를 위한 메시지 포맷팅"""
         system_prompt = """당신은 전문적인 문서 분석 AI입니다. 제공된 문서들을 바탕으로 사용자의 질문에 정확하고 도움이 되는 답변을 해주세요.
@@ -1,17 +1,29 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
+from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import List, Dict, Any
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from typing import List, Dict, Any, Union
 import os
+import asyncio
 import shutil
 import tempfile
 import time
+import json
+import logging
 from datetime import datetime
 
-from database import get_db, init_db
+from database import get_db, init_db, async_session, get_pool_stats, schedule_vector_index_maintenance
+from corpus import corpus_events
+from executor import run_blocking, shutdown_executors
 from pdf_processor import PDFProcessor
 from qa_service import QAService
-from models import QuestionRequest, QuestionResponse, DocumentInfo, FileUploadResult, MultipleUploadResponse
+from llm_client import InternalLLMClient
+from model_registry import model_registry, MODEL_PRELOAD
+from vector_index import vector_index, IN_MEMORY_INDEX
+from lexical_index import lexical_index
+from qa_service import RETRIEVAL_MODE, RERANK_ENABLED, RERANK_MODEL
+from jobs import IngestionJobManager, JobQueueFullError
+from metrics import render_metrics
+from models import QuestionRequest, QuestionResponse, DocumentInfo, FileUploadResult, MultipleUploadResponse, JobStatus, JobSubmitResponse
 
 app = FastAPI(
     title="PDF 질의응답 AI 서버",
@@ -19,6 +31,19 @@ app = FastAPI(
     version="1.0.0"
 )
 
+logger = logging.getLogger(__name__)
+
+# 다중 업로드 시 동시에 처리할 최대 파일 수
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", str(os.cpu_count() or 1)))
+
+# 일괄 질의응답 설정
+# - BATCH_MAX_QUESTIONS: 한 요청에 허용하는 최대 질문 수
+# - BATCH_CONCURRENCY: 동시에 처리 중인 질문 수 (질문마다 DB 세션을 사용하므로 DB 풀 크기 고려)
+# - BATCH_LLM_CONCURRENCY: 동시에 실행하는 LLM 호출 수
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "5000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
 # CORS 설정
 app.add_middleware(
     CORSMiddleware,
@@ -29,13 +54,46 @@ app.add_middleware(
 )
 
 # 서비스 초기화
-pdf_processor = PDFProcessor()
-qa_service = QAService()
+# LLM 클라이언트(연결 풀 포함)는 서비스 간에 공유
+llm_client = InternalLLMClient()
+pdf_processor = PDFProcessor(llm_client)
+qa_service = QAService(llm_client)
+job_manager = IngestionJobManager(pdf_processor)
 
 @app.on_event("startup")
 async def startup_event():
     """애플리케이션 시작 시 데이터베이스 초기화"""
     await init_db()
+    # IVFFlat 인덱스는 문서 적재 후 행 수에 맞게 재생성
+    corpus_events.subscribe(on_added=lambda *args: schedule_vector_index_maintenance())
+    if IN_MEMORY_INDEX:
+        # 검색용 메모리 벡터 인덱스 로드 후 문서 업로드/삭제 시 점진적으로 갱신
+        await vector_index.load_or_build()
+        corpus_events.subscribe(
+            on_added=vector_index.add_document,
+            on_deleted=vector_index.remove_document
+        )
+    if RETRIEVAL_MODE == "hybrid":
+        # 하이브리드 검색용 BM25 색인 구성 후 점진적으로 갱신
+        await lexical_index.build()
+        corpus_events.subscribe(
+            on_added=lexical_index.add_document,
+            on_deleted=lexical_index.remove_document
+        )
+    if MODEL_PRELOAD:
+        # 첫 요청이 모델 로드를 기다리지 않도록 미리 로드
+        await run_blocking(llm_client.preload_models)
+        if RERANK_ENABLED:
+            await run_blocking(model_registry.get_cross_encoder, RERANK_MODEL)
+    await job_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """애플리케이션 종료 시 수집 워커, LLM 연결 풀 및 워커 풀 정리"""
+    await job_manager.stop()
+    await vector_index.flush()
+    await llm_client.aclose()
+    shutdown_executors()
 
 @app.get("/")
 async def root():
@@ -55,9 +113,9 @@ async def health_check():
                 import pytesseract
                 from pdf2image import convert_from_path
                 
-                # Tesseract 명령어 실행 테스트
-                version = pytesseract.get_tesseract_version()
-                langs = pytesseract.get_languages()
+                # Tesseract 명령어 실행 테스트 (서브프로세스 호출이므로 워커 풀에서 실행)
+                version = await run_blocking(pytesseract.get_tesseract_version)
+                langs = await run_blocking(pytesseract.get_languages)
                 
                 ocr_info = {
                     "status": "available",
@@ -81,6 +139,26 @@ async def health_check():
         "ocr": ocr_info
     }
 
+def _collect_stats() -> Dict[str, Any]:
+    """서비스 내부 통계 (캐시, 연결 풀, 모델, 인덱스)"""
+    return {
+        "qa": qa_service.get_cache_stats(),
+        "llm_http_pool": llm_client.get_pool_stats(),
+        "models": model_registry.stats(),
+        "db_pool": get_pool_stats(),
+        "vector_index": vector_index.stats()
+    }
+
+@app.get("/stats")
+async def get_stats():
+    """서비스 내부 통계 (캐시 적중률 등)"""
+    return {"timestamp": datetime.now().isoformat(), **_collect_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus 텍스트 형식 지표 (단계별 처리 시간 히스토그램, 요청 수, /stats의 현재 값 게이지)"""
+    return PlainTextResponse(render_metrics(_collect_stats()), media_type="text/plain; version=0.0.4")
+
 @app.get("/test-ocr")
 async def test_ocr():
     """OCR 기능 테스트 엔드포인트"""
@@ -113,10 +191,10 @@ async def test_ocr():
                 draw.text((20, 50), text, fill='black')
             
             # OCR 테스트
-            test_result = pytesseract.image_to_string(test_image, lang='eng')
+            test_result = await run_blocking(pytesseract.image_to_string, test_image, lang='eng')
             
             # 언어 지원 확인
-            available_langs = pytesseract.get_languages()
+            available_langs = await run_blocking(pytesseract.get_languages)
             
             return {
                 "status": "success",
@@ -142,15 +220,27 @@ async def test_ocr():
             "message": f"OCR 모듈 import 실패: {e}"
         }
 
-@app.post("/upload-pdf", response_model=Dict[str, Any])
+@app.post("/upload-pdf", response_model=Union[JobSubmitResponse, Dict[str, Any]])
 async def upload_pdf(
     file: UploadFile = File(...),
+    background: bool = Query(False, description="True면 작업 ID만 즉시 반환하고 백그라운드에서 처리"),
     db=Depends(get_db)
 ):
     """PDF 파일 업로드 및 벡터화"""
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="PDF 파일만 업로드 가능합니다.")
     
+    if background:
+        try:
+            job_id = await job_manager.submit(file.file, file.filename)
+        except JobQueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        return JobSubmitResponse(
+            message=f"PDF '{file.filename}' 처리 작업이 등록되었습니다.",
+            job_id=job_id,
+            filename=file.filename
+        )
+    
     try:
         # 임시 파일로 저장
         with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
@@ -158,6 +248,7 @@ async def upload_pdf(
             tmp_path = tmp_file.name
         
         # PDF 처리 및 벡터화
+        start_time = time.time()
         result = await pdf_processor.process_pdf(tmp_path, file.filename, db)
         
         # 임시 파일 삭제
@@ -170,7 +261,9 @@ async def upload_pdf(
             "chunks_count": result["chunks_count"],
             "extraction_method": result.get("extraction_method", "Standard"),
             "content_length": result.get("content_length", 0),
-            "original_content_length": result.get("original_content_length", 0)
+            "original_content_length": result.get("original_content_length", 0),
+            "processing_time": time.time() - start_time,
+            "timings": result.get("timings", {})
         }
     
     except ValueError as ve:
@@ -193,44 +286,46 @@ async def upload_pdf(
         logger.error(f"PDF '{file.filename}' 처리 중 예상치 못한 오류: {e}")
         raise HTTPException(status_code=500, detail=f"서버 내부 오류가 발생했습니다. 다른 PDF로 시도해보세요.")
 
-@app.post("/upload-multiple-pdfs", response_model=MultipleUploadResponse)
-async def upload_multiple_pdfs(
-    files: List[UploadFile] = File(...),
-    db=Depends(get_db)
-):
-    """여러 PDF 파일을 한 번에 업로드 및 벡터화"""
-    start_time = time.time()
-    results = []
-    successful_uploads = 0
-    failed_uploads = 0
+async def _process_uploaded_file(
+    file: UploadFile, 
+    background: bool, 
+    semaphore: asyncio.Semaphore
+) -> FileUploadResult:
+    """다중 업로드의 개별 파일 처리 (파일마다 별도 세션/트랜잭션 사용)"""
+    file_start_time = time.time()
+    result = FileUploadResult(
+        filename=file.filename,
+        success=False,
+        message="",
+        document_id=None,
+        chunks_count=None,
+        error=None
+    )
     
-    for file in files:
-        result = FileUploadResult(
-            filename=file.filename,
-            success=False,
-            message="",
-            document_id=None,
-            chunks_count=None,
-            error=None
-        )
+    try:
+        # PDF 파일 검증
+        if not file.filename.endswith('.pdf'):
+            result.error = "PDF 파일만 업로드 가능합니다."
+            result.message = f"파일 '{file.filename}': PDF 파일이 아닙니다."
+            return result
         
-        try:
-            # PDF 파일 검증
-            if not file.filename.endswith('.pdf'):
-                result.error = "PDF 파일만 업로드 가능합니다."
-                result.message = f"파일 '{file.filename}': PDF 파일이 아닙니다."
-                failed_uploads += 1
-                results.append(result)
-                continue
-            
+        if background:
+            # 백그라운드 작업으로 등록
+            result.job_id = await job_manager.submit(file.file, file.filename)
+            result.success = True
+            result.message = f"파일 '{file.filename}' 처리 작업이 등록되었습니다."
+            return result
+        
+        async with semaphore:
             # 임시 파일로 저장
             with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                shutil.copyfileobj(file.file, tmp_file)
+                await run_blocking(shutil.copyfileobj, file.file, tmp_file)
                 tmp_path = tmp_file.name
             
             try:
                 # PDF 처리 및 벡터화
-                process_result = await pdf_processor.process_pdf(tmp_path, file.filename, db)
+                async with async_session() as db:
+                    process_result = await pdf_processor.process_pdf(tmp_path, file.filename, db)
                 
                 # 성공 결과 설정
                 result.success = True
@@ -240,7 +335,7 @@ async def upload_multiple_pdfs(
                 result.message = f"파일 '{file.filename}' 처리 완료: {chunks_count}개 청크 생성 ({extraction_method}, {content_length}자)"
                 result.document_id = process_result["document_id"]
                 result.chunks_count = chunks_count
-                successful_uploads += 1
+                result.timings = process_result.get("timings")
                 
             finally:
                 # 임시 파일 삭제
@@ -248,14 +343,32 @@ async def upload_multiple_pdfs(
                     os.unlink(tmp_path)
                 except:
                     pass
-                    
-        except Exception as e:
-            # 실패 결과 설정
-            result.error = str(e)
-            result.message = f"파일 '{file.filename}' 처리 중 오류가 발생했습니다."
-            failed_uploads += 1
-        
-        results.append(result)
+                
+    except Exception as e:
+        # 실패 결과 설정
+        result.error = str(e)
+        result.message = f"파일 '{file.filename}' 처리 중 오류가 발생했습니다."
+    
+    finally:
+        result.processing_time = time.time() - file_start_time
+    
+    return result
+
+@app.post("/upload-multiple-pdfs", response_model=MultipleUploadResponse)
+async def upload_multiple_pdfs(
+    files: List[UploadFile] = File(...),
+    background: bool = Query(False, description="True면 파일별 작업 ID만 즉시 반환하고 백그라운드에서 처리")
+):
+    """여러 PDF 파일을 한 번에 업로드 및 벡터화 (UPLOAD_CONCURRENCY개까지 동시 처리)"""
+    start_time = time.time()
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+    
+    # 입력 순서대로 결과 반환
+    results = await asyncio.gather(
+        *(_process_uploaded_file(file, background, semaphore) for file in files)
+    )
+    successful_uploads = sum(1 for result in results if result.success)
+    failed_uploads = len(results) - successful_uploads
     
     processing_time = time.time() - start_time
     
@@ -267,6 +380,18 @@ async def upload_multiple_pdfs(
         processing_time=processing_time
     )
 
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job_status(job_id: str):
+    """수집 작업 진행 상황 조회"""
+    try:
+        job = await job_manager.get_job(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"작업 조회 중 오류가 발생했습니다: {str(e)}")
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return job
+
 @app.post("/ask", response_model=QuestionResponse)
 async def ask_question(
     request: QuestionRequest,
@@ -278,13 +403,119 @@ async def ask_question(
             question=request.question,
             document_ids=request.document_ids,
             top_k=request.top_k,
-            db=db
+            db=db,
+            ef_search=request.ef_search,
+            probes=request.probes,
+            hybrid=request.hybrid,
+            rerank=request.rerank,
+            expansion=request.expansion
         )
         return response
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"질문 처리 중 오류가 발생했습니다: {str(e)}")
 
+@app.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """질문에 대한 답변을 Server-Sent Events로 스트리밍
+
+    출처 문서(sources)를 먼저 보내고, 이어서 답변 토큰(token)을 생성되는 대로 보낸 뒤 done으로 끝납니다.
+    """
+    async def event_stream():
+        # 스트리밍 응답은 요청 의존성보다 오래 살아 있으므로 세션을 직접 관리
+        try:
+            async with async_session() as db:
+                async for event in qa_service.answer_question_stream(
+                    question=request.question,
+                    document_ids=request.document_ids,
+                    top_k=request.top_k,
+                    db=db,
+                    ef_search=request.ef_search,
+                    probes=request.probes,
+                    hybrid=request.hybrid,
+                    rerank=request.rerank,
+                    expansion=request.expansion
+                ):
+                    yield f"event: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+        except Exception as e:
+            logger.error(f"스트리밍 질의응답 처리 중 오류 발생: {e}")
+            error = {"detail": f"질문 처리 중 오류가 발생했습니다: {str(e)}"}
+            yield f"event: error\ndata: {json.dumps(error, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _answer_batch_item(
+    index: int,
+    request: QuestionRequest,
+    question_embedding: List[float],
+    semaphore: asyncio.Semaphore,
+    llm_semaphore: asyncio.Semaphore
+) -> Dict[str, Any]:
+    """일괄 질의응답의 개별 질문 처리 (질문마다 별도 세션 사용)"""
+    async with semaphore:
+        try:
+            async with async_session() as db:
+                response = await qa_service.answer_question(
+                    question=request.question,
+                    document_ids=request.document_ids,
+                    top_k=request.top_k,
+                    db=db,
+                    ef_search=request.ef_search,
+                    probes=request.probes,
+                    hybrid=request.hybrid,
+                    rerank=request.rerank,
+                    expansion=request.expansion,
+                    question_embedding=question_embedding,
+                    llm_semaphore=llm_semaphore
+                )
+            return {"index": index, "response": response.model_dump(mode="json")}
+        except Exception as e:
+            return {"index": index, "error": f"질문 처리 중 오류가 발생했습니다: {str(e)}"}
+
+@app.post("/ask/batch")
+async def ask_questions_batch(requests: List[QuestionRequest]):
+    """여러 질문을 한 번에 처리하고 결과를 NDJSON으로 스트리밍
+
+    모든 질문을 한 번의 배치로 임베딩한 뒤 검색은 BATCH_CONCURRENCY개까지, LLM 호출은
+    BATCH_LLM_CONCURRENCY개까지 동시에 실행합니다. 각 줄은 끝난 순서대로
+    {"index": 요청 내 위치, "response": QuestionResponse} 또는 {"index", "error"} 형태입니다.
+    """
+    if not requests:
+        raise HTTPException(status_code=400, detail="질문 목록이 비어 있습니다.")
+    if len(requests) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"한 번에 최대 {BATCH_MAX_QUESTIONS}개의 질문만 처리할 수 있습니다.")
+    
+    try:
+        embeddings = await qa_service.embed_questions([request.question for request in requests])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"질문 임베딩 중 오류가 발생했습니다: {str(e)}")
+    
+    async def result_stream():
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        llm_semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+        tasks = [
+            asyncio.create_task(_answer_batch_item(i, request, embedding, semaphore, llm_semaphore))
+            for i, (request, embedding) in enumerate(zip(requests, embeddings))
+        ]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            # 클라이언트 연결이 끊기면 남은 질문 처리 취소
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(
+        result_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/documents", response_model=List[DocumentInfo])
 async def list_documents(db=Depends(get_db)):
     """업로드된 문서 목록 조회"""
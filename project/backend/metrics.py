@@ -0,0 +1,187 @@
+import re
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+# Prometheus 지표 이름 접두사
+METRICS_PREFIX = "pdfqa"
+
+# 단계별 처리 시간 히스토그램 버킷 (초): 임베딩/검색(ms 단위)부터 LLM/OCR(수십 초)까지
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Mapping[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label_value(str(value))}"' for key, value in labels.items()) + "}"
+
+
+class Counter:
+    """단조 증가 카운터"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """누적 버킷 히스토그램"""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # 라벨 값 -> (버킷별 개수, 합계, 전체 개수)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    bucket_labels = {**labels, "le": _format_value(bound)}
+                    lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+ask_stage_seconds = Histogram(
+    "ask_stage_seconds", "질의응답 단계별 처리 시간 (embed, search, rerank, context, llm, sources)", ["stage"]
+)
+ask_duration_seconds = Histogram("ask_duration_seconds", "질의응답 전체 처리 시간", ["outcome"])
+ask_requests_total = Counter("ask_requests_total", "질의응답 요청 수 (결과별)", ["outcome"])
+
+upload_stage_seconds = Histogram(
+    "upload_stage_seconds", "PDF 수집 단계별 처리 시간 (load, split, ocr, embed, insert)", ["stage"]
+)
+upload_duration_seconds = Histogram("upload_duration_seconds", "PDF 수집 전체 처리 시간", ["outcome"])
+upload_documents_total = Counter("upload_documents_total", "PDF 수집 건수 (결과별)", ["outcome"])
+
+_METRICS = [
+    ask_stage_seconds, ask_duration_seconds, ask_requests_total,
+    upload_stage_seconds, upload_duration_seconds, upload_documents_total
+]
+
+
+def record_ask(timings: Mapping[str, float], duration: float, outcome: str) -> None:
+    """질의응답 한 건의 단계별 시간 기록
+
+    outcome: answered | cached | retrieval_skipped | no_documents | error
+    """
+    for stage, seconds in timings.items():
+        ask_stage_seconds.observe(seconds, stage=stage)
+    ask_duration_seconds.observe(duration, outcome=outcome)
+    ask_requests_total.inc(outcome=outcome)
+
+
+def record_upload(timings: Mapping[str, float], duration: float, outcome: str) -> None:
+    """PDF 수집 한 건의 단계별 시간 기록
+
+    outcome: processed | deduplicated | failed
+    """
+    for stage, seconds in timings.items():
+        upload_stage_seconds.observe(seconds, stage=stage)
+    upload_duration_seconds.observe(duration, outcome=outcome)
+    upload_documents_total.inc(outcome=outcome)
+
+
+# 키가 모델 경로처럼 바뀌는 값인 통계 dict 경로 -> 라벨 이름
+# (지표 이름에 넣으면 모델이 바뀔 때마다 새 지표가 생기므로 라벨로 출력)
+LABELED_STATS = {("models", "models"): "model"}
+
+
+def _flatten_gauges(
+    stats: Mapping[str, Any],
+    prefix: str,
+    path: Tuple[str, ...] = (),
+    labels: Optional[Dict[str, str]] = None
+) -> List[Tuple[str, Dict[str, str], float]]:
+    """중첩된 통계 dict에서 숫자 값만 (지표 이름, 라벨, 값) 목록으로 변환"""
+    gauges = []
+    labels = labels or {}
+    label_name = LABELED_STATS.get(path)
+    for key, value in stats.items():
+        if label_name is not None:
+            if isinstance(value, Mapping):
+                gauges.extend(_flatten_gauges(value, prefix, path + ("*",), {**labels, label_name: str(key)}))
+            continue
+        name = _INVALID_NAME_CHARS.sub("_", f"{prefix}_{key}").lower()
+        if isinstance(value, Mapping):
+            gauges.extend(_flatten_gauges(value, name, path + (str(key),), labels))
+        elif isinstance(value, bool):
+            gauges.append((name, labels, 1.0 if value else 0.0))
+        elif isinstance(value, (int, float)):
+            gauges.append((name, labels, float(value)))
+    return gauges
+
+
+def render_metrics(gauges: Optional[Mapping[str, Any]] = None) -> str:
+    """Prometheus 텍스트 형식으로 모든 지표 출력
+
+    gauges에는 /stats와 같은 형태의 통계 dict를 넘기며, 숫자 값은 현재 값 게이지로 출력합니다
+    (예: {"db_pool": {"checked_out": 3}} -> pdfqa_db_pool_checked_out 3.0).
+    LABELED_STATS에 등록된 경로의 키는 라벨이 됩니다
+    (예: pdfqa_models_models_load_time{model="embedding:..."}).
+    """
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    # 같은 지표의 샘플은 한 곳에 모아 출력
+    samples: Dict[str, List[str]] = {}
+    for name, labels, value in _flatten_gauges(gauges or {}, METRICS_PREFIX):
+        samples.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    for name, metric_lines in samples.items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.extend(metric_lines)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,103 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 시작 시 모델을 미리 로드할지 여부 (false면 첫 사용 시 로드)
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "true").lower() == "true"
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """현재 프로세스의 상주 메모리(RSS) 크기 (바이트)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # Linux에서는 KB 단위 최대 RSS (현재 값이 아닌 최대값)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return None
+
+
+def resolve_embedding_model_path() -> str:
+    """임베딩 모델 경로 결정 (폐쇄망 환경에서는 미리 다운로드한 모델 사용)"""
+    default_model_path = "/app/paraphrase-MiniLM-L3-v2" if os.path.exists("/app") else "paraphrase-MiniLM-L3-v2"
+    embedding_model_path = os.getenv("LOCAL_EMBEDDING_MODEL", default_model_path)
+
+    # 절대 경로로 변환 (상대 경로 시작 문자 제거)
+    if embedding_model_path.startswith("./"):
+        embedding_model_path = embedding_model_path[2:]
+    return embedding_model_path
+
+
+class ModelRegistry:
+    """프로세스 전역 모델 레지스트리
+
+    같은 키의 모델은 프로세스 안에서 한 번만 로드하여 모든 서비스가 공유합니다.
+    로드는 워커 스레드에서 동시에 요청될 수 있으므로 잠금으로 보호합니다.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, Any] = {}
+        self._load_stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """모델 반환 (없으면 loader로 로드 후 등록)"""
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                return model
+
+            rss_before = _current_rss_bytes()
+            start_time = time.time()
+            model = loader()
+            load_time = time.time() - start_time
+            rss_after = _current_rss_bytes()
+
+            self._models[key] = model
+            self._load_stats[key] = {
+                "load_time": load_time,
+                "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+                "loaded_at": time.time()
+            }
+            logger.info(f"모델 로드 완료: {key} ({load_time:.2f}초)")
+            return model
+
+    def get_embedding_model(self, model_path: str):
+        """SentenceTransformer 임베딩 모델 반환"""
+        def load():
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(model_path)
+        return self.get(f"embedding:{model_path}", load)
+
+    def get_cross_encoder(self, model_path: str):
+        """재순위화용 CrossEncoder 모델 반환"""
+        def load():
+            from sentence_transformers import CrossEncoder
+            return CrossEncoder(model_path)
+        return self.get(f"cross_encoder:{model_path}", load)
+
+    def stats(self) -> Dict[str, Any]:
+        """로드된 모델과 로드 시간, 메모리 사용량"""
+        return {
+            "preload": MODEL_PRELOAD,
+            "process_rss_bytes": _current_rss_bytes(),
+            "models": dict(self._load_stats)
+        }
+
+
+# 프로세스 전역 모델 레지스트리
+model_registry = ModelRegistry()
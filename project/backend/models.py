@@ -8,6 +8,11 @@ class QuestionRequest(BaseModel):
     question: str = Field(..., description="사용자 질문")
     document_ids: Optional[List[str]] = Field(None, description="검색할 문서 ID 목록 (None이면 모든 문서에서 검색)")
     top_k: int = Field(default=5, ge=1, le=20, description="검색할 문서 청크 수")
+    ef_search: Optional[int] = Field(None, ge=1, le=1000, description="HNSW 검색 후보 수 (None이면 서버 기본값)")
+    probes: Optional[int] = Field(None, ge=1, le=10000, description="IVFFlat 검색 리스트 수 (None이면 서버 기본값)")
+    hybrid: Optional[bool] = Field(None, description="BM25 + 벡터 하이브리드 검색 사용 여부 (None이면 서버 설정 RETRIEVAL_MODE)")
+    rerank: Optional[bool] = Field(None, description="크로스 인코더 재순위화 사용 여부 (None이면 서버 설정 RERANK_ENABLED)")
+    expansion: Optional[str] = Field(None, pattern="^(off|synonyms|llm)$", description="질의 확장 방식 off/synonyms/llm (None이면 서버 설정 QUERY_EXPANSION)")
 
 class SourceDocument(BaseModel):
     """출처 문서 정보"""
@@ -23,6 +28,10 @@ class QuestionResponse(BaseModel):
     answer: str
     source_documents: List[SourceDocument]
     processing_time: float
+    timings: Dict[str, float] = Field(default_factory=dict, description="단계별 처리 시간 (초)")
+    context_tokens: int = Field(default=0, description="LLM에 보낸 컨텍스트의 추정 토큰 수")
+    retrieval_skipped: bool = Field(default=False, description="문서 검색이 필요 없는 질문(인사 등)으로 판단해 검색을 생략했는지 여부")
+    cached: bool = Field(default=False, description="답변 캐시에서 재사용된 응답인지 여부")
 
 class DocumentInfo(BaseModel):
     """문서 정보 모델"""
@@ -61,6 +70,9 @@ class FileUploadResult(BaseModel):
     document_id: Optional[str] = None
     chunks_count: Optional[int] = None
     error: Optional[str] = None
+    job_id: Optional[str] = None
+    processing_time: Optional[float] = Field(None, description="파일별 처리 시간 (초)")
+    timings: Optional[Dict[str, float]] = Field(None, description="단계별 처리 시간 (load, split, ocr, embed, insert, 초)")
 
 class MultipleUploadResponse(BaseModel):
     """다중 파일 업로드 응답"""
@@ -68,4 +80,25 @@ class MultipleUploadResponse(BaseModel):
     successful_uploads: int
     failed_uploads: int
     results: List[FileUploadResult]
-    processing_time: float
\ No newline at end of file
+    processing_time: float
+
+class JobSubmitResponse(BaseModel):
+    """백그라운드 수집 작업 등록 응답 (/upload-pdf?background=true)"""
+    success: bool = True
+    message: str
+    job_id: str
+    filename: str
+    status: str = Field(default="queued", description="작업 상태 (GET /jobs/{job_id}로 조회)")
+
+class JobStatus(BaseModel):
+    """수집 작업 상태"""
+    id: str
+    filename: str
+    status: str = Field(..., description="queued | running | completed | failed")
+    stage: str = Field(..., description="현재 처리 단계")
+    progress: float = Field(..., description="진행률 (0~100)")
+    document_id: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
\ No newline at end of file
@@ -1,10 +1,14 @@
 import os
+import time
 import uuid
+import bisect
 import logging
 import json
-from typing import List, Dict, Any
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable, Iterable, Iterator
 from datetime import datetime
 
+import numpy as np
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from sqlalchemy import text
@@ -12,7 +16,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 try:
     import pytesseract
-    from pdf2image import convert_from_path
+    from pdf2image import convert_from_path, pdfinfo_from_path
     from PIL import Image
     OCR_AVAILABLE = True
 except ImportError:
@@ -20,15 +24,137 @@ except ImportError:
     logging.warning("OCR 패키지가 설치되지 않았습니다. 스캔된 PDF 처리가 제한됩니다.")
 
 from models import DocumentInfo
+from database import format_vector, parse_vector
+from executor import run_blocking, get_process_executor
+from corpus import corpus_events
+from metrics import record_upload
 from llm_client import InternalLLMClient
 
 logger = logging.getLogger(__name__)
 
+# 진행 상황 콜백: (단계 이름, 진행률 0~100)
+ProgressCallback = Callable[[str, float], Awaitable[None]]
+
+# OCR 래스터화 해상도
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+
+# documents.content에 저장할 문서 앞부분 미리보기 길이 (전체 텍스트는 청크로만 저장)
+DOCUMENT_PREVIEW_LENGTH = int(os.getenv("DOCUMENT_PREVIEW_LENGTH", "1000"))
+
+def _ocr_page(file_path: str, page_number: int, dpi: int, lang: str, config: str) -> Tuple[int, str, Optional[str]]:
+    """단일 페이지를 래스터화하고 OCR 수행 (프로세스 풀 워커에서 실행되는 최상위 함수)
+
+    한 번에 한 페이지만 이미지로 변환하므로 메모리 사용량이 워커 수에 비례합니다.
+    """
+    # 워커 수만큼 병렬 실행되므로 tesseract 내부 멀티스레딩은 끔 (과다 구독 방지)
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    try:
+        images = convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number)
+        if not images:
+            return page_number, "", None
+        text = pytesseract.image_to_string(images[0], lang=lang, config=config)
+        return page_number, (text or "").strip(), None
+    except Exception as e:
+        return page_number, "", f"{type(e).__name__}: {e}"
+
+class PageChunkStream:
+    """페이지 텍스트를 하나씩 받아 청크를 점진적으로 생성
+
+    문서 전체를 한 문자열로 합치지 않고, 아직 확정되지 않은 마지막 청크와 새 페이지만
+    버퍼에 두고 분할합니다. 마지막 청크는 다음 페이지와 이어질 수 있으므로 다음 분할로
+    넘기고(페이지 경계에서도 chunk_overlap 유지), 그 앞의 청크들만 확정합니다.
+    버퍼 안 페이지 시작 위치를 기록해 두어 각 청크가 걸친 실제 페이지 번호를 계산하고,
+    OCR 필요성 판단에 쓰는 문자 수 통계도 페이지마다 누적합니다.
+    """
+
+    def __init__(self, text_splitter, separator: str = "\n", preview_length: int = DOCUMENT_PREVIEW_LENGTH):
+        self.text_splitter = text_splitter
+        self.separator = separator
+        self.preview_length = preview_length
+        self.page_count = 0
+        self.char_count = 0
+        self.meaningful_chars = 0
+        self.preview = ""
+        self.split_seconds = 0.0
+        self._buffer = ""
+        self._page_starts: List[int] = []
+        self._page_numbers: List[int] = []
+
+    @property
+    def meaningful_ratio(self) -> float:
+        """알파벳, 숫자, 한글 등 의미 있는 문자 비율"""
+        return self.meaningful_chars / self.char_count if self.char_count else 0.0
+
+    def add_page(self, page_number: int, page_text: str) -> List[Tuple[str, List[int]]]:
+        """페이지를 추가하고 확정된 (청크, 페이지 번호 목록) 반환"""
+        self.page_count += 1
+        stripped = page_text.strip()
+        if not stripped:
+            return []
+
+        self.char_count += len(stripped)
+        self.meaningful_chars += sum(1 for c in stripped if c.isalnum() or c in '가-힣')
+        if len(self.preview) < self.preview_length:
+            preview = f"{self.preview}{self.separator}{stripped}" if self.preview else stripped
+            self.preview = preview[:self.preview_length]
+
+        if self._buffer:
+            self._buffer += self.separator
+        self._page_starts.append(len(self._buffer))
+        self._page_numbers.append(page_number)
+        self._buffer += page_text
+
+        start_time = time.perf_counter()
+        chunks = self._split()
+        if len(chunks) <= 1:
+            # 아직 청크 하나 분량이면 다음 페이지와 함께 분할
+            self.split_seconds += time.perf_counter() - start_time
+            return []
+
+        # 마지막 청크 시작 위치부터 버퍼에 남기고 앞의 청크들은 확정
+        carry_start = chunks[-1][0]
+        finished = [(chunk, self._pages_for(start, len(chunk))) for start, chunk in chunks[:-1]]
+        first_page = bisect.bisect_right(self._page_starts, carry_start) - 1
+        self._page_starts = [max(0, start - carry_start) for start in self._page_starts[first_page:]]
+        self._page_numbers = self._page_numbers[first_page:]
+        self._buffer = self._buffer[carry_start:]
+        self.split_seconds += time.perf_counter() - start_time
+        return finished
+
+    def finish(self) -> List[Tuple[str, List[int]]]:
+        """남은 버퍼를 모두 청크로 확정"""
+        start_time = time.perf_counter()
+        finished = [(chunk, self._pages_for(start, len(chunk))) for start, chunk in self._split()]
+        self._buffer = ""
+        self._page_starts = []
+        self._page_numbers = []
+        self.split_seconds += time.perf_counter() - start_time
+        return finished
+
+    def _split(self) -> List[Tuple[int, str]]:
+        """버퍼를 분할하고 각 청크의 버퍼 내 시작 위치를 함께 반환"""
+        chunks = []
+        search_from = 0
+        for chunk in self.text_splitter.split_text(self._buffer):
+            start = self._buffer.find(chunk, search_from)
+            if start < 0:
+                start = search_from
+            chunks.append((start, chunk))
+            search_from = start + 1
+        return chunks
+
+    def _pages_for(self, start: int, length: int) -> List[int]:
+        """버퍼의 [start, start + length) 구간이 걸친 페이지 번호"""
+        first = max(0, bisect.bisect_right(self._page_starts, start) - 1)
+        last = max(first, bisect.bisect_left(self._page_starts, start + length) - 1)
+        return self._page_numbers[first:last + 1]
+
+
 class PDFProcessor:
     """PDF 문서 처리 및 벡터화 서비스"""
     
-    def __init__(self):
-        self.llm_client = InternalLLMClient()
+    def __init__(self, llm_client: Optional[InternalLLMClient] = None):
+        self.llm_client = llm_client or InternalLLMClient()
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200,
@@ -61,8 +187,8 @@ class PDFProcessor:
                 self.ocr_lang = 'eng'  # fallback
                 logger.warning(f"OCR 언어 설정 실패, 영어로 fallback: {e}")
     
-    def _extract_text_with_ocr(self, file_path: str) -> str:
-        """OCR을 사용하여 PDF에서 텍스트 추출"""
+    def _ocr_pages(self, file_path: str) -> Iterator[Tuple[int, str]]:
+        """OCR을 사용하여 PDF에서 페이지별 텍스트 추출 ((페이지 번호, 텍스트)를 페이지 순서대로 생성)"""
         if not OCR_AVAILABLE:
             logger.error("OCR 패키지가 설치되지 않았습니다.")
             raise RuntimeError("OCR 패키지가 설치되지 않았습니다.")
@@ -83,83 +209,92 @@ class PDFProcessor:
                 logger.error(f"Tesseract 접근 실패: {e}")
                 raise RuntimeError(f"Tesseract가 설치되지 않았거나 접근할 수 없습니다: {e}")
             
-            # PDF를 이미지로 변환
-            logger.info("PDF를 이미지로 변환 시작...")
+            # 페이지 수 확인 (이미지 변환은 워커에서 페이지 단위로 지연 수행)
             try:
-                images = convert_from_path(file_path, dpi=300)
-                logger.info(f"PDF를 {len(images)}개 이미지로 변환 완료")
+                total_pages = int(pdfinfo_from_path(file_path)["Pages"])
             except Exception as e:
-                logger.error(f"PDF→이미지 변환 실패: {e}")
+                logger.error(f"PDF 페이지 정보 조회 실패: {e}")
                 raise RuntimeError(f"PDF를 이미지로 변환할 수 없습니다. poppler-utils가 설치되었는지 확인하세요: {e}")
             
-            # 각 페이지에서 OCR로 텍스트 추출
-            extracted_texts = []
-            total_pages = len(images)
-            logger.info(f"총 {total_pages}개 페이지에서 OCR 시작")
-            
-            for i, image in enumerate(images):
-                try:
-                    logger.info(f"페이지 {i+1}/{total_pages} OCR 처리 중...")
-                    
-                    # 이미지 정보 확인
-                    logger.debug(f"페이지 {i+1} 이미지 크기: {image.size}")
-                    
-                    # OCR 수행
-                    logger.debug(f"OCR 설정 - 언어: {self.ocr_lang}, 설정: {self.ocr_config}")
-                    text = pytesseract.image_to_string(
-                        image, 
-                        lang=self.ocr_lang,
-                        config=self.ocr_config
-                    )
-                    
-                    if text and text.strip():
-                        extracted_texts.append(text.strip())
-                        logger.info(f"페이지 {i+1}: {len(text.strip())}자 추출 성공")
-                    else:
-                        logger.warning(f"페이지 {i+1}: OCR 결과가 비어있음")
-                        
-                except Exception as e:
-                    logger.error(f"페이지 {i+1} OCR 처리 실패: {type(e).__name__}: {e}")
-                    continue
+            # 페이지별 OCR을 프로세스 풀에 분산 (map은 입력 순서대로 결과 반환)
+            logger.info(f"총 {total_pages}개 페이지에서 병렬 OCR 시작 (DPI: {OCR_DPI})")
+            logger.debug(f"OCR 설정 - 언어: {self.ocr_lang}, 설정: {self.ocr_config}")
+            page_numbers = range(1, total_pages + 1)
+            results = get_process_executor().map(
+                _ocr_page,
+                [file_path] * total_pages,
+                page_numbers,
+                [OCR_DPI] * total_pages,
+                [self.ocr_lang] * total_pages,
+                [self.ocr_config] * total_pages
+            )
             
-            combined_text = "\n\n".join(extracted_texts)
-            logger.info(f"OCR 완료: 총 {len(combined_text)}자 추출")
+            extracted_chars = 0
+            for page_number, text, error in results:
+                if error:
+                    logger.error(f"페이지 {page_number} OCR 처리 실패: {error}")
+                elif text:
+                    extracted_chars += len(text)
+                    logger.info(f"페이지 {page_number}/{total_pages}: {len(text)}자 추출 성공")
+                    yield page_number, text
+                else:
+                    logger.warning(f"페이지 {page_number}: OCR 결과가 비어있음")
             
-            return combined_text
+            logger.info(f"OCR 완료: 총 {extracted_chars}자 추출")
             
         except Exception as e:
             logger.error(f"OCR 처리 중 오류: {e}")
             raise
     
-    async def process_pdf(self, file_path: str, filename: str, db: AsyncSession) -> Dict[str, Any]:
-        """PDF 파일을 처리하고 벡터화하여 데이터베이스에 저장"""
+    async def process_pdf(
+        self, 
+        file_path: str, 
+        filename: str, 
+        db: AsyncSession,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """PDF 파일을 처리하고 벡터화하여 데이터베이스에 저장
+
+        반환값의 timings에는 단계별 처리 시간(load, split, ocr, embed, insert, 초)이 들어갑니다.
+        """
+        start_time = time.time()
+        timings: Dict[str, float] = {}
         try:
-            # Step 1: 일반적인 PDF 텍스트 추출 시도
-            loader = PyPDFLoader(file_path)
-            pages = loader.load()
+            # Step 0: 동일한 파일이 이미 처리되었는지 확인 (내용 해시 기준)
+            stage_start = time.perf_counter()
+            content_hash = await run_blocking(self._hash_file, file_path)
+            existing = await self._find_document_by_hash(content_hash, db)
+            # 조회 트랜잭션을 바로 종료해 추출/OCR 동안 연결이 idle in transaction으로 남지 않게 함
+            # (INSERT의 ON CONFLICT가 삽입 시점에 해시 중복을 다시 확인)
+            await db.commit()
+            if existing:
+                timings["load"] = time.perf_counter() - stage_start
+                return await self._deduplicated(existing, filename, timings, start_time, progress_callback)
             
-            # 전체 문서 내용 결합
-            full_content = "\n".join([page.page_content for page in pages])
+            # Step 1: 일반적인 PDF 텍스트 추출과 청크 분할을 페이지 단위로 함께 수행
+            # (전체 문서를 한 문자열로 합치지 않으며, 문자 수 통계도 페이지마다 누적)
+            await self._report_progress(progress_callback, "loading", 5)
+            chunks, stream = await run_blocking(self._chunk_pages, self._load_pages(file_path), "\n")
+            timings["split"] = stream.split_seconds
+            timings["load"] = time.perf_counter() - stage_start - stream.split_seconds
+            original_stream = stream
             
-            logger.info(f"PDF '{filename}': {len(pages)}개 페이지, 일반 추출로 {len(full_content)}자 획득")
+            logger.info(f"PDF '{filename}': {stream.page_count}개 페이지, 일반 추출로 {stream.char_count}자 획득")
             
             # Step 2: 기본 텍스트 검증 (비어있어도 OCR 시도 가능하면 계속 진행)
-            if not full_content or len(full_content.strip()) == 0:
+            if stream.char_count == 0:
                 logger.warning(f"PDF '{filename}': 기본 텍스트 추출 실패 (빈 내용)")
                 if not OCR_AVAILABLE:
                     error_msg = "PDF에서 텍스트를 추출할 수 없습니다 (OCR 기능이 비활성화됨)"
                     raise ValueError(error_msg)
                 else:
                     logger.info(f"PDF '{filename}': OCR로 텍스트 추출 시도...")
-                    # 빈 텍스트로 시작하지만 OCR에서 텍스트를 얻을 수 있음
-                    full_content = ""
             
-            # Step 3: 첫 번째 청크 생성 시도
-            original_content = full_content
-            texts = self.text_splitter.split_text(full_content)
-            valid_texts = [text.strip() for text in texts if text.strip() and len(text.strip()) > 10]
+            # Step 3: 유효 청크 선별
+            await self._report_progress(progress_callback, "splitting", 15)
+            valid_chunks = self._valid_chunks(chunks)
             
-            logger.info(f"PDF '{filename}': 일반 추출로 {len(texts)}개 청크, {len(valid_texts)}개 유효 청크 생성")
+            logger.info(f"PDF '{filename}': 일반 추출로 {len(chunks)}개 청크, {len(valid_chunks)}개 유효 청크 생성")
             
             # Step 4: 청크가 부족하거나 텍스트가 부족한 경우 OCR 시도
             min_text_threshold = 500  # 500자 미만이면 OCR 시도 (기존 100자에서 증가)
@@ -167,51 +302,47 @@ class PDFProcessor:
             use_ocr = False
             
             # 텍스트 품질 확인 (특수문자/공백 비율)
-            text_content = full_content.strip()
-            if text_content:
-                # 알파벳, 숫자, 한글 등 의미 있는 문자 비율 계산
-                meaningful_chars = sum(1 for c in text_content if c.isalnum() or c in '가-힣')
-                meaningful_ratio = meaningful_chars / len(text_content) if text_content else 0
+            meaningful_ratio = stream.meaningful_ratio
+            if stream.char_count:
                 logger.info(f"PDF '{filename}' 텍스트 품질: {meaningful_ratio:.2f} (의미있는 문자 비율)")
-            else:
-                meaningful_ratio = 0
             
             should_try_ocr = (
-                len(text_content) == 0 or                      # 완전히 빈 텍스트 (스캔 PDF)
-                len(text_content) < min_text_threshold or      # 텍스트 부족
-                len(valid_texts) < min_chunks_threshold or     # 유효한 청크 부족
+                stream.char_count == 0 or                      # 완전히 빈 텍스트 (스캔 PDF)
+                stream.char_count < min_text_threshold or      # 텍스트 부족
+                len(valid_chunks) < min_chunks_threshold or    # 유효한 청크 부족
                 meaningful_ratio < 0.7                         # 텍스트 품질 낮음 (70% 미만)
             )
             
             # 상세한 OCR 판단 로그
             logger.info(f"PDF '{filename}' OCR 필요성 판단:")
-            logger.info(f"  - 텍스트 길이: {len(text_content)}자 (임계값: {min_text_threshold}자)")
-            logger.info(f"  - 유효 청크: {len(valid_texts)}개 (임계값: {min_chunks_threshold}개)")
+            logger.info(f"  - 텍스트 길이: {stream.char_count}자 (임계값: {min_text_threshold}자)")
+            logger.info(f"  - 유효 청크: {len(valid_chunks)}개 (임계값: {min_chunks_threshold}개)")
             logger.info(f"  - 텍스트 품질: {meaningful_ratio:.2f} (임계값: 0.7)")
             logger.info(f"  - OCR 시도 여부: {should_try_ocr}")
             logger.info(f"  - OCR 사용 가능: {OCR_AVAILABLE}")
             
             if should_try_ocr and OCR_AVAILABLE:
-                reason = "텍스트 부족" if len(full_content.strip()) < min_text_threshold else "유효 청크 부족"
-                logger.info(f"PDF '{filename}': {reason}({len(full_content.strip())}자, {len(valid_texts)}개 청크), OCR 시도...")
+                reason = "텍스트 부족" if stream.char_count < min_text_threshold else "유효 청크 부족"
+                logger.info(f"PDF '{filename}': {reason}({stream.char_count}자, {len(valid_chunks)}개 청크), OCR 시도...")
                 
+                stage_start = time.perf_counter()
                 try:
-                    ocr_content = self._extract_text_with_ocr(file_path)
-                    if len(ocr_content.strip()) > 0:
-                        # OCR 결과로 청크 재생성
-                        ocr_texts = self.text_splitter.split_text(ocr_content)
-                        ocr_valid_texts = [text.strip() for text in ocr_texts if text.strip() and len(text.strip()) > 10]
+                    await self._report_progress(progress_callback, "ocr", 25)
+                    # OCR은 CPU를 오래 점유하므로 워커 풀에서 실행 (OCR된 페이지를 바로 같은 방식으로 분할)
+                    ocr_chunks, ocr_stream = await run_blocking(self._chunk_pages, self._ocr_pages(file_path), "\n\n")
+                    if ocr_stream.char_count > 0:
+                        ocr_valid_chunks = self._valid_chunks(ocr_chunks)
                         
-                        logger.info(f"PDF '{filename}': OCR로 {len(ocr_texts)}개 청크, {len(ocr_valid_texts)}개 유효 청크 생성")
+                        logger.info(f"PDF '{filename}': OCR로 {len(ocr_chunks)}개 청크, {len(ocr_valid_chunks)}개 유효 청크 생성")
                         
                         # OCR 결과가 더 좋으면 사용
-                        if (len(ocr_valid_texts) > len(valid_texts) or 
-                            (len(ocr_valid_texts) >= len(valid_texts) and len(ocr_content.strip()) > len(full_content.strip()))):
-                            full_content = ocr_content
-                            texts = ocr_texts
-                            valid_texts = ocr_valid_texts
+                        if (len(ocr_valid_chunks) > len(valid_chunks) or 
+                            (len(ocr_valid_chunks) >= len(valid_chunks) and ocr_stream.char_count > stream.char_count)):
+                            stream = ocr_stream
+                            chunks = ocr_chunks
+                            valid_chunks = ocr_valid_chunks
                             use_ocr = True
-                            logger.info(f"PDF '{filename}': OCR 결과 채택 ({len(ocr_content)}자, {len(ocr_valid_texts)}개 유효 청크)")
+                            logger.info(f"PDF '{filename}': OCR 결과 채택 ({ocr_stream.char_count}자, {len(ocr_valid_chunks)}개 유효 청크)")
                         else:
                             logger.info(f"PDF '{filename}': 기존 결과가 더 좋음, OCR 결과 무시")
                     else:
@@ -219,16 +350,17 @@ class PDFProcessor:
                         
                 except Exception as ocr_error:
                     logger.error(f"PDF '{filename}': OCR 실패 - {ocr_error}")
+                timings["ocr"] = time.perf_counter() - stage_start
             elif should_try_ocr and not OCR_AVAILABLE:
                 logger.warning(f"PDF '{filename}': OCR이 필요하지만 패키지가 설치되지 않음")
             elif not should_try_ocr:
                 logger.info(f"PDF '{filename}': OCR 불필요 (조건 만족)")
             
             # Step 5: 최종 검증 (OCR 결과 포함)
-            content_length = len(full_content.strip())
+            content_length = stream.char_count
             
             # 최종 결과 검증
-            if len(valid_texts) == 0:
+            if len(valid_chunks) == 0:
                 error_msg = f"유효한 텍스트 청크를 생성할 수 없습니다. (총 텍스트: {content_length}자)"
                 
                 if use_ocr:
@@ -250,82 +382,264 @@ class PDFProcessor:
             # 문서 ID 생성
             document_id = str(uuid.uuid4())
             
-            # 문서 정보를 데이터베이스에 저장
-            await db.execute(
+            # 문서 정보를 데이터베이스에 저장 (본문은 청크로 저장하고 documents에는 미리보기만 저장)
+            stage_start = time.perf_counter()
+            # 같은 파일의 동시 업로드는 content_hash 유일 인덱스에서 충돌하며,
+            # 먼저 시작한 업로드가 끝날 때까지 기다린 뒤 그 문서를 중복으로 반환
+            result = await db.execute(
                 text("""
-                    INSERT INTO documents (id, filename, content, metadata)
-                    VALUES (:id, :filename, :content, :metadata)
+                    INSERT INTO documents (id, filename, content, metadata, content_hash)
+                    VALUES (:id, :filename, :content, :metadata, :content_hash)
+                    ON CONFLICT (content_hash) DO NOTHING
+                    RETURNING id
                 """),
                 {
                     "id": document_id,
                     "filename": filename,
-                    "content": full_content,
+                    "content": stream.preview,
+                    "content_hash": content_hash,
                     "metadata": json.dumps({
-                        "page_count": len(pages),
+                        "content_hash": content_hash,
+                        "page_count": original_stream.page_count,
                         "file_size": os.path.getsize(file_path) if os.path.exists(file_path) else 0,
                         "extraction_method": "OCR" if use_ocr else "Standard",
                         "ocr_available": OCR_AVAILABLE,
                         "content_length": content_length,
-                        "total_chunks": len(texts),
-                        "valid_chunks": len(valid_texts),
-                        "original_content_length": len(original_content.strip())
+                        "total_chunks": len(chunks),
+                        "valid_chunks": len(valid_chunks),
+                        "original_content_length": original_stream.char_count
                     })
                 }
             )
+            if result.fetchone() is None:
+                await db.rollback()
+                existing = await self._find_document_by_hash(content_hash, db)
+                if existing is None:
+                    raise ValueError("동시에 업로드된 같은 문서가 삭제되었습니다. 다시 업로드해주세요.")
+                timings["insert"] = time.perf_counter() - stage_start
+                return await self._deduplicated(existing, filename, timings, start_time, progress_callback)
             
-            # 유효한 청크만 사용
-            texts = valid_texts
+            timings["insert"] = time.perf_counter() - stage_start
             
-            # 각 청크를 벡터화하고 저장
-            for i, chunk_text in enumerate(texts):
-                # 임베딩 생성 (로컬 CPU에서 처리)
-                embedding = self.llm_client.get_embedding(chunk_text)
-                
-                # 청크를 데이터베이스에 저장
+            # 유효한 청크만 사용
+            texts = [chunk_text for chunk_text, _ in valid_chunks]
+            
+            # 모든 청크를 마이크로 배치로 한 번에 벡터화 (로컬 CPU에서 처리)
+            # 이전 업로드에 동일한 텍스트의 청크가 있으면 저장된 임베딩을 재사용
+            await self._report_progress(progress_callback, "embedding", 50)
+            stage_start = time.perf_counter()
+            chunk_hashes = [self._hash_text(chunk_text) for chunk_text in texts]
+            embeddings = await self._embed_chunks(texts, chunk_hashes, db)
+            # 임베딩 모델 실패 시의 더미(0) 벡터는 저장하지 않음 (검색되지 않고 재사용되어서도 안 됨)
+            embedded = np.any(embeddings != 0, axis=1)
+            failed_count = len(texts) - int(embedded.sum())
+            logger.info(f"PDF '{filename}': {len(texts)}개 청크 배치 임베딩 완료")
+            if failed_count:
+                # 파일 해시를 지워 같은 파일을 다시 업로드하면 중복으로 건너뛰지 않고 새로 처리
+                logger.warning(f"PDF '{filename}': {failed_count}개 청크 임베딩 실패, 다시 업로드하면 재처리됩니다")
                 await db.execute(
-                    text("""
-                        INSERT INTO document_chunks (document_id, chunk_index, content, embedding, metadata)
-                        VALUES (:document_id, :chunk_index, :content, :embedding, :metadata)
-                    """),
-                    {
-                        "document_id": document_id,
-                        "chunk_index": i,
-                        "content": chunk_text,
-                        "embedding": f"[{','.join(map(str, embedding))}]",  # PostgreSQL vector 형식으로 변환
-                        "metadata": json.dumps({
-                            "chunk_length": len(chunk_text),
-                            "page_numbers": self._extract_page_numbers(chunk_text, pages)
-                        })
-                    }
+                    text("UPDATE documents SET content_hash = NULL WHERE id = :id"),
+                    {"id": document_id}
                 )
+            timings["embed"] = time.perf_counter() - stage_start
+            
+            await self._report_progress(progress_callback, "inserting", 85)
+            stage_start = time.perf_counter()
+            
+            # 모든 청크를 한 번의 executemany로 일괄 저장 (asyncpg가 단일 라운드트립으로 파이프라이닝)
+            chunk_rows = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "document_id": document_id,
+                    "chunk_index": i,
+                    "content": chunk_text,
+                    "content_hash": chunk_hashes[i],
+                    "embedding": format_vector(embeddings[i]) if embedded[i] else None,  # PostgreSQL vector 형식으로 변환
+                    "embedding_model": self.llm_client.embedding_model_path,
+                    "metadata": json.dumps({
+                        "chunk_length": len(chunk_text),
+                        "page_numbers": valid_chunks[i][1]
+                    })
+                }
+                for i, chunk_text in enumerate(texts)
+            ]
+            await db.execute(
+                text("""
+                    INSERT INTO document_chunks (
+                        id, document_id, chunk_index, content, content_hash, embedding, embedding_model, metadata
+                    )
+                    VALUES (
+                        :id, :document_id, :chunk_index, :content, :content_hash, :embedding, :embedding_model, :metadata
+                    )
+                """),
+                chunk_rows
+            )
             
             await db.commit()
+            timings["insert"] += time.perf_counter() - stage_start
+            
+            # 코퍼스 변경 알림 (캐시 무효화 등)
+            corpus_events.documents_added(document_id, filename, [
+                {
+                    "id": row["id"],
+                    "chunk_index": row["chunk_index"],
+                    "content": row["content"],
+                    "metadata": json.loads(row["metadata"]),
+                    "embedding": embeddings[row["chunk_index"]] if embedded[row["chunk_index"]] else None
+                }
+                for row in chunk_rows
+            ])
             
             extraction_info = f"{'OCR' if use_ocr else '일반'} 추출"
             logger.info(f"PDF '{filename}' 처리 완료: {len(texts)}개 유효 청크 생성 ({extraction_info}, {content_length}자)")
+            record_upload(timings, time.time() - start_time, "processed")
             
             return {
                 "document_id": document_id,
                 "chunks_count": len(texts),
                 "extraction_method": "OCR" if use_ocr else "Standard",
                 "content_length": content_length,
-                "original_content_length": len(original_content.strip())
+                "original_content_length": original_stream.char_count,
+                "timings": timings
             }
             
         except Exception as e:
+            record_upload(timings, time.time() - start_time, "failed")
             await db.rollback()
             logger.error(f"PDF 처리 중 오류 발생: {e}")
             raise
     
-    def _extract_page_numbers(self, chunk_text: str, pages: List) -> List[int]:
-        """청크가 포함된 페이지 번호 추출 (간단한 구현)"""
-        # 실제로는 더 정교한 페이지 매핑이 필요할 수 있습니다
-        page_numbers = []
-        for i, page in enumerate(pages):
-            if chunk_text[:100] in page.page_content:
-                page_numbers.append(i + 1)
-                break
-        return page_numbers or [1]
+    async def _deduplicated(
+        self,
+        existing: Dict[str, Any],
+        filename: str,
+        timings: Dict[str, float],
+        start_time: float,
+        progress_callback: Optional[ProgressCallback]
+    ) -> Dict[str, Any]:
+        """이미 저장된 같은 내용의 문서를 처리 결과로 반환"""
+        logger.info(f"PDF '{filename}': 동일한 내용의 문서가 이미 존재함 ({existing['document_id']}), 처리 생략")
+        await self._report_progress(progress_callback, "deduplicated", 100)
+        record_upload(timings, time.time() - start_time, "deduplicated")
+        return {**existing, "timings": timings}
+    
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
+        """파일 내용의 SHA-256 해시 계산"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _hash_text(chunk_text: str) -> str:
+        """청크 텍스트의 SHA-256 해시 계산"""
+        return hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()
+    
+    async def _find_document_by_hash(self, content_hash: str, db: AsyncSession) -> Optional[Dict[str, Any]]:
+        """같은 내용 해시를 가진 기존 문서 조회"""
+        result = await db.execute(
+            text("""
+                SELECT 
+                    d.id,
+                    d.metadata,
+                    (SELECT COUNT(*) FROM document_chunks dc WHERE dc.document_id = d.id) as chunks_count
+                FROM documents d
+                WHERE d.content_hash = :content_hash
+                ORDER BY d.created_at
+                LIMIT 1
+            """),
+            {"content_hash": content_hash}
+        )
+        row = result.fetchone()
+        if not row:
+            return None
+        
+        metadata = row.metadata or {}
+        return {
+            "document_id": str(row.id),
+            "chunks_count": row.chunks_count,
+            "extraction_method": metadata.get("extraction_method", "Standard"),
+            "content_length": metadata.get("content_length", 0),
+            "original_content_length": metadata.get("original_content_length", 0),
+            "deduplicated": True
+        }
+    
+    async def _embed_chunks(self, texts: List[str], chunk_hashes: List[str], db: AsyncSession) -> np.ndarray:
+        """청크 임베딩 생성 (텍스트 해시와 임베딩 모델이 같은 기존 청크의 임베딩은 재사용)
+
+        모델 실패로 저장된 적 있는 0 벡터는 재사용하지 않습니다.
+        """
+        result = await db.execute(
+            text("""
+                SELECT DISTINCT ON (content_hash) content_hash, embedding::text as embedding
+                FROM document_chunks
+                WHERE content_hash = ANY(:hashes)
+                  AND embedding_model = :embedding_model
+                  AND embedding IS NOT NULL
+                  AND vector_norm(embedding) > 0
+            """),
+            {"hashes": list(set(chunk_hashes)), "embedding_model": self.llm_client.embedding_model_path}
+        )
+        cached = {row.content_hash: parse_vector(row.embedding) for row in result}
+        
+        missing = [i for i, chunk_hash in enumerate(chunk_hashes) if chunk_hash not in cached]
+        logger.info(f"청크 임베딩 캐시: {len(texts) - len(missing)}개 재사용, {len(missing)}개 새로 생성")
+        
+        new_embeddings = await run_blocking(self.llm_client.get_embeddings, [texts[i] for i in missing])
+        if not cached:
+            return new_embeddings
+        
+        embeddings = np.empty((len(texts), new_embeddings.shape[1]), dtype=np.float32)
+        for i, chunk_hash in enumerate(chunk_hashes):
+            if chunk_hash in cached:
+                embeddings[i] = cached[chunk_hash]
+        for row_index, i in enumerate(missing):
+            embeddings[i] = new_embeddings[row_index]
+        return embeddings
+    
+    async def _report_progress(
+        self, 
+        progress_callback: Optional[ProgressCallback], 
+        stage: str, 
+        percent: float
+    ) -> None:
+        """진행 상황 콜백 호출 (콜백 실패는 처리 자체를 중단시키지 않음)"""
+        if progress_callback is None:
+            return
+        try:
+            await progress_callback(stage, percent)
+        except Exception as e:
+            logger.warning(f"진행 상황 보고 실패 ({stage}): {e}")
+    
+    @staticmethod
+    def _load_pages(file_path: str) -> Iterator[Tuple[int, str]]:
+        """PDF 페이지를 하나씩 읽어 (페이지 번호, 텍스트) 생성"""
+        for i, page in enumerate(PyPDFLoader(file_path).lazy_load()):
+            yield page.metadata.get("page", i) + 1, page.page_content
+    
+    def _chunk_pages(
+        self,
+        pages: Iterable[Tuple[int, str]],
+        separator: str
+    ) -> Tuple[List[Tuple[str, List[int]]], PageChunkStream]:
+        """페이지를 읽는 대로 분할하여 (청크, 페이지 번호 목록)과 분할 통계 반환 (워커 풀에서 실행)"""
+        stream = PageChunkStream(self.text_splitter, separator)
+        chunks = []
+        for page_number, page_text in pages:
+            chunks.extend(stream.add_page(page_number, page_text))
+        chunks.extend(stream.finish())
+        return chunks, stream
+    
+    @staticmethod
+    def _valid_chunks(chunks: List[Tuple[str, List[int]]]) -> List[Tuple[str, List[int]]]:
+        """너무 짧은 청크 제외 (앞뒤 공백 제거)"""
+        return [
+            (chunk_text.strip(), page_numbers)
+            for chunk_text, page_numbers in chunks
+            if len(chunk_text.strip()) > 10
+        ]
     
     async def get_documents_list(self, db: AsyncSession) -> List[DocumentInfo]:
         """저장된 문서 목록 조회"""
@@ -386,6 +700,7 @@ class PDFProcessor:
             )
             
             await db.commit()
+            corpus_events.document_deleted(document_id)
             
             logger.info(f"문서 {document_id} 삭제 완료")
             return True
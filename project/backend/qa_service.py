@@ -1,113 +1,663 @@
+import os
 import time
+import asyncio
 import logging
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
 
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models import QuestionResponse, SourceDocument
 from llm_client import InternalLLMClient
+from database import async_session, format_vector, apply_search_params
+from executor import run_blocking
+from cache import TTLCache, SemanticAnswerCache, normalize_question
+from corpus import corpus_events
+from vector_index import vector_index
+from lexical_index import lexical_index
+from model_registry import model_registry
+from query_expansion import QueryExpander, QUERY_EXPANSION, QUERY_EXPANSION_DEADLINE
+from retrieval_gate import RetrievalGate
+from metrics import record_ask
 
 logger = logging.getLogger(__name__)
 
+# 질문 임베딩 캐시 설정
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+
+# 의미 기반 답변 캐시 설정
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+
+# 검색 방식 설정
+# - RETRIEVAL_MODE: vector (기본값) | hybrid (BM25 + 벡터 검색을 RRF로 결합, 시작 시 BM25 색인 구성)
+# - HYBRID_CANDIDATES_MULTIPLIER: 각 검색에서 top_k의 몇 배까지 후보를 가져와 결합할지
+# - RRF_K: reciprocal rank fusion 상수 (1 / (RRF_K + 순위))
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector").lower()
+HYBRID_CANDIDATES_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATES_MULTIPLIER", "4"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# 크로스 인코더 재순위화 설정
+# - RERANK_ENABLED: 기본 사용 여부 (요청의 rerank 값이 우선)
+# - RERANK_OVERFETCH: top_k의 몇 배만큼 후보를 가져와 재순위화할지
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_OVERFETCH = int(os.getenv("RERANK_OVERFETCH", "3"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+
+# 컨텍스트 구성 설정
+# - CONTEXT_TOKEN_BUDGET: LLM에 보낼 컨텍스트의 최대 토큰 수 (추정치)
+# - CONTEXT_MAX_OVERLAP: 인접 청크 병합 시 제거할 중복 구간의 최대 길이 (문자, 분할기 chunk_overlap 이상)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+CONTEXT_MAX_OVERLAP = int(os.getenv("CONTEXT_MAX_OVERLAP", "400"))
+CONTEXT_MIN_OVERLAP = 20
+# 중복 구간 없이 이어지는 인접 청크 사이에 넣는 구분자
+CONTEXT_CHUNK_SEPARATOR = "\n"
+
+NO_RELEVANT_DOCUMENTS_ANSWER = "질문과 관련된 문서를 찾을 수 없습니다. 문서를 업로드하고 다시 시도해주세요."
+
+def estimate_tokens(content: str) -> int:
+    """토크나이저 없이 토큰 수 추정 (한글은 글자당 약 1토큰, 그 외는 4글자당 약 1토큰)"""
+    hangul = sum(1 for char in content if "가" <= char <= "힣")
+    return hangul + (len(content) - hangul + 3) // 4
+
+
+def strip_overlap(previous: str, current: str, max_overlap: int = CONTEXT_MAX_OVERLAP) -> str:
+    """current 앞부분이 previous 끝부분과 겹치면(분할기의 chunk_overlap) 겹친 부분을 제거"""
+    limit = min(max_overlap, len(previous), len(current))
+    for size in range(limit, CONTEXT_MIN_OVERLAP - 1, -1):
+        if previous.endswith(current[:size]):
+            return current[size:]
+    return current
+
+
+def build_vector_search_query(filter_documents: bool) -> str:
+    """벡터 검색 쿼리 생성 (2단계 실행 계획)
+
+    1단계 서브쿼리는 거리 연산식 자체(embedding <=> q)로 정렬하고 LIMIT을 걸어
+    pgvector ANN 인덱스가 정렬을 처리하도록 합니다. 계산된 별칭(similarity_score)으로
+    정렬하면 인덱스를 쓸 수 없어 전체 테이블을 순차 스캔하게 됩니다.
+    2단계에서 top_k개 결과에만 documents를 조인해 파일명을 붙입니다.
+
+    문서 필터가 있으면 ANN 인덱스를 쓰지 않습니다. pgvector는 인덱스가 돌려준 후보
+    (HNSW는 최대 ef_search개)에 필터를 나중에 적용하므로, 큰 코퍼스에서 작은 문서로
+    범위를 좁히면 결과가 거의 남지 않습니다. 대신 MATERIALIZED CTE로 document_id 인덱스에서
+    해당 문서의 청크만 읽은 뒤 정확한 거리로 정렬합니다.
+    """
+    if filter_documents:
+        return """
+            WITH candidates AS MATERIALIZED (
+                SELECT 
+                    dc.id,
+                    dc.document_id,
+                    dc.chunk_index,
+                    dc.content,
+                    dc.metadata,
+                    dc.embedding <=> CAST(:question_embedding AS vector) as distance
+                FROM document_chunks dc
+                WHERE dc.document_id = ANY(:document_ids) AND dc.embedding IS NOT NULL
+            )
+            SELECT 
+                c.id,
+                c.document_id,
+                c.chunk_index,
+                c.content,
+                c.metadata,
+                d.filename,
+                1 - c.distance as similarity_score
+            FROM (
+                SELECT * FROM candidates
+                ORDER BY distance
+                LIMIT :limit
+            ) c
+            JOIN documents d ON c.document_id = d.id
+            ORDER BY c.distance
+        """
+    return """
+        SELECT 
+            c.id,
+            c.document_id,
+            c.chunk_index,
+            c.content,
+            c.metadata,
+            d.filename,
+            1 - c.distance as similarity_score
+        FROM (
+            SELECT 
+                dc.id,
+                dc.document_id,
+                dc.chunk_index,
+                dc.content,
+                dc.metadata,
+                dc.embedding <=> CAST(:question_embedding AS vector) as distance
+            FROM document_chunks dc
+            WHERE dc.embedding IS NOT NULL
+            ORDER BY dc.embedding <=> CAST(:question_embedding AS vector)
+            LIMIT :limit
+        ) c
+        JOIN documents d ON c.document_id = d.id
+        ORDER BY c.distance
+    """
+
 class QAService:
     """질의응답 서비스"""
     
-    def __init__(self):
-        self.llm_client = InternalLLMClient()
+    def __init__(self, llm_client: Optional[InternalLLMClient] = None):
+        self.llm_client = llm_client or InternalLLMClient()
+        self.query_embedding_cache = TTLCache(
+            maxsize=QUERY_EMBEDDING_CACHE_SIZE,
+            ttl=QUERY_EMBEDDING_CACHE_TTL
+        )
+        self.answer_cache = SemanticAnswerCache(
+            maxsize=ANSWER_CACHE_SIZE,
+            threshold=ANSWER_CACHE_THRESHOLD,
+            ttl=ANSWER_CACHE_TTL
+        )
+        self.query_expander = QueryExpander(self.llm_client)
+        self.retrieval_gate = RetrievalGate(self.llm_client)
+        # 문서가 업로드/삭제되면 답변 캐시 무효화
+        corpus_events.subscribe(
+            on_added=lambda *args: self.answer_cache.clear(),
+            on_deleted=lambda *args: self.answer_cache.clear()
+        )
     
     async def answer_question(
         self, 
         question: str, 
         document_ids: Optional[List[str]], 
         top_k: int, 
-        db: AsyncSession
+        db: AsyncSession,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        hybrid: Optional[bool] = None,
+        rerank: Optional[bool] = None,
+        expansion: Optional[str] = None,
+        question_embedding: Optional[List[float]] = None,
+        llm_semaphore: Optional[asyncio.Semaphore] = None
     ) -> QuestionResponse:
-        """질문에 대한 답변 생성"""
+        """질문에 대한 답변 생성
+
+        question_embedding을 넘기면 질문 임베딩을 다시 계산하지 않고(배치 임베딩),
+        llm_semaphore를 넘기면 검색 필요 여부 확인, 질의 확장, 답변 생성의 LLM 호출 동시 실행 수를
+        그 세마포어로 제한합니다.
+        """
         start_time = time.time()
+        timings: Dict[str, float] = {}
         
         try:
-            # 1. 질문을 벡터화 (로컬 CPU에서 처리)
-            question_embedding = self.llm_client.get_embedding(question)
+            # 1. 질문을 벡터화 (반복 질문은 캐시 사용)
+            if question_embedding is None:
+                stage_start = time.perf_counter()
+                question_embedding = await self._embed_question(question)
+                timings["embed"] = time.perf_counter() - stage_start
             
-            # 2. 유사한 문서 청크 검색
-            relevant_chunks = await self._search_relevant_chunks(
-                question_embedding, document_ids, top_k, db
+            # 의미가 거의 같은 이전 질문의 답변이 있으면 재사용
+            corpus_version = corpus_events.version
+            use_hybrid = self._use_hybrid(hybrid)
+            use_rerank = self._use_rerank(rerank)
+            expansion_mode = expansion or QUERY_EXPANSION
+            cache_scope = (
+                tuple(sorted(document_ids)) if document_ids else None,
+                top_k, ef_search, probes, use_hybrid, use_rerank, expansion_mode
+            )
+            cached_response = self.answer_cache.lookup(question_embedding, cache_scope, corpus_version)
+            if cached_response is not None:
+                record_ask(timings, time.time() - start_time, "cached")
+                return cached_response.model_copy(update={
+                    "question": question,
+                    "processing_time": time.time() - start_time,
+                    "timings": timings,
+                    "cached": True
+                })
+            
+            # 인사 등 문서 검색이 필요 없는 질문은 검색/컨텍스트 구성 없이 바로 답변
+            if not await self.retrieval_gate.needs_retrieval(question, question_embedding, llm_semaphore):
+                stage_start = time.perf_counter()
+                messages = self.llm_client.format_messages_for_chat(question)
+                answer = await self._chat_completion(messages, llm_semaphore)
+                timings["llm"] = time.perf_counter() - stage_start
+                response = QuestionResponse(
+                    question=question,
+                    answer=answer,
+                    source_documents=[],
+                    processing_time=time.time() - start_time,
+                    timings=timings,
+                    retrieval_skipped=True
+                )
+                self.answer_cache.store(question_embedding, cache_scope, corpus_version, response)
+                record_ask(timings, response.processing_time, "retrieval_skipped")
+                return response
+            
+            # 2. 유사한 문서 청크 검색 (재순위화 사용 시 후보를 더 가져와 상위 top_k만 선택)
+            relevant_chunks = await self._retrieve(
+                question, question_embedding, document_ids, top_k, db, ef_search, probes,
+                use_hybrid, use_rerank, expansion_mode, timings, llm_semaphore
             )
             
             if not relevant_chunks:
+                record_ask(timings, time.time() - start_time, "no_documents")
                 return QuestionResponse(
                     question=question,
-                    answer="질문과 관련된 문서를 찾을 수 없습니다. 문서를 업로드하고 다시 시도해주세요.",
+                    answer=NO_RELEVANT_DOCUMENTS_ANSWER,
                     source_documents=[],
-                    processing_time=time.time() - start_time
+                    processing_time=time.time() - start_time,
+                    timings=timings
                 )
             
-            # 3. 컨텍스트 구성
-            context = self._build_context(relevant_chunks)
+            # 3. 토큰 예산 안에서 컨텍스트 구성 (실제로 사용한 청크만 출처로 표시)
+            stage_start = time.perf_counter()
+            relevant_chunks = self._select_context_chunks(relevant_chunks)
+            context, context_tokens = self._build_context(relevant_chunks)
+            timings["context"] = time.perf_counter() - stage_start
+            
+            # LLM 응답을 기다리는 동안 DB 연결을 풀에 반환 (검색 트랜잭션은 읽기 전용)
+            await db.commit()
             
             # 4. 내부 LLM을 사용하여 답변 생성
+            stage_start = time.perf_counter()
             messages = self.llm_client.format_messages_for_qa(context, question)
-            answer = await self.llm_client.chat_completion(messages, temperature=0.0)
+            answer = await self._chat_completion(messages, llm_semaphore)
+            timings["llm"] = time.perf_counter() - stage_start
             
             # 5. 출처 문서 정보 구성
+            stage_start = time.perf_counter()
             source_documents = await self._build_source_documents(relevant_chunks, db)
+            timings["sources"] = time.perf_counter() - stage_start
             
             processing_time = time.time() - start_time
             
-            return QuestionResponse(
+            response = QuestionResponse(
                 question=question,
                 answer=answer,
                 source_documents=source_documents,
-                processing_time=processing_time
+                processing_time=processing_time,
+                timings=timings,
+                context_tokens=context_tokens
             )
+            self.answer_cache.store(question_embedding, cache_scope, corpus_version, response)
+            record_ask(timings, processing_time, "answered")
+            return response
             
         except Exception as e:
+            record_ask(timings, time.time() - start_time, "error")
             logger.error(f"질의응답 처리 중 오류 발생: {e}")
             raise
     
+    async def answer_question_stream(
+        self, 
+        question: str, 
+        document_ids: Optional[List[str]], 
+        top_k: int, 
+        db: AsyncSession,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        hybrid: Optional[bool] = None,
+        rerank: Optional[bool] = None,
+        expansion: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """질문에 대한 답변을 스트리밍으로 생성
+
+        (이벤트 이름, 데이터) 형태의 dict를 순서대로 생성합니다:
+        sources(출처 문서 목록) → token(답변 조각, 여러 번) → done(처리 시간 등)
+        """
+        start_time = time.time()
+        timings: Dict[str, float] = {}
+        
+        try:
+            # 1. 질문 벡터화 및 답변 캐시 확인
+            stage_start = time.perf_counter()
+            question_embedding = await self._embed_question(question)
+            timings["embed"] = time.perf_counter() - stage_start
+            corpus_version = corpus_events.version
+            use_hybrid = self._use_hybrid(hybrid)
+            use_rerank = self._use_rerank(rerank)
+            expansion_mode = expansion or QUERY_EXPANSION
+            cache_scope = (
+                tuple(sorted(document_ids)) if document_ids else None,
+                top_k, ef_search, probes, use_hybrid, use_rerank, expansion_mode
+            )
+            cached_response = self.answer_cache.lookup(question_embedding, cache_scope, corpus_version)
+            if cached_response is not None:
+                yield {"event": "sources", "data": [doc.model_dump() for doc in cached_response.source_documents]}
+                yield {"event": "token", "data": cached_response.answer}
+                record_ask(timings, time.time() - start_time, "cached")
+                yield {"event": "done", "data": {
+                    "processing_time": time.time() - start_time,
+                    "timings": timings,
+                    "context_tokens": cached_response.context_tokens,
+                    "retrieval_skipped": cached_response.retrieval_skipped,
+                    "cached": True
+                }}
+                return
+        
+            # 인사 등 문서 검색이 필요 없는 질문은 검색/컨텍스트 구성 없이 바로 답변
+            if not await self.retrieval_gate.needs_retrieval(question, question_embedding):
+                yield {"event": "sources", "data": []}
+                stage_start = time.perf_counter()
+                messages = self.llm_client.format_messages_for_chat(question)
+                answer_parts = []
+                async for token in self.llm_client.chat_completion_stream(messages, temperature=0.0):
+                    answer_parts.append(token)
+                    yield {"event": "token", "data": token}
+                timings["llm"] = time.perf_counter() - stage_start
+            
+                processing_time = time.time() - start_time
+                self.answer_cache.store(question_embedding, cache_scope, corpus_version, QuestionResponse(
+                    question=question,
+                    answer="".join(answer_parts),
+                    source_documents=[],
+                    processing_time=processing_time,
+                    timings=timings,
+                    retrieval_skipped=True
+                ))
+                record_ask(timings, processing_time, "retrieval_skipped")
+                yield {"event": "done", "data": {
+                    "processing_time": processing_time,
+                    "timings": timings,
+                    "context_tokens": 0,
+                    "retrieval_skipped": True,
+                    "cached": False
+                }}
+                return
+        
+            # 2. 유사한 문서 청크 검색 후 출처 문서를 먼저 전송
+            relevant_chunks = await self._retrieve(
+                question, question_embedding, document_ids, top_k, db, ef_search, probes,
+                use_hybrid, use_rerank, expansion_mode, timings
+            )
+            stage_start = time.perf_counter()
+            relevant_chunks = self._select_context_chunks(relevant_chunks)
+            context, context_tokens = self._build_context(relevant_chunks)
+            timings["context"] = time.perf_counter() - stage_start
+        
+            stage_start = time.perf_counter()
+            source_documents = await self._build_source_documents(relevant_chunks, db)
+            timings["sources"] = time.perf_counter() - stage_start
+            yield {"event": "sources", "data": [doc.model_dump() for doc in source_documents]}
+        
+            if not relevant_chunks:
+                yield {"event": "token", "data": NO_RELEVANT_DOCUMENTS_ANSWER}
+                record_ask(timings, time.time() - start_time, "no_documents")
+                yield {"event": "done", "data": {
+                    "processing_time": time.time() - start_time,
+                    "timings": timings,
+                    "context_tokens": 0,
+                    "retrieval_skipped": False,
+                    "cached": False
+                }}
+                return
+        
+            # 3. LLM 토큰을 생성되는 대로 전달 (그동안 DB 연결은 풀에 반환)
+            await db.commit()
+            stage_start = time.perf_counter()
+            messages = self.llm_client.format_messages_for_qa(context, question)
+            answer_parts = []
+            async for token in self.llm_client.chat_completion_stream(messages, temperature=0.0):
+                answer_parts.append(token)
+                yield {"event": "token", "data": token}
+            timings["llm"] = time.perf_counter() - stage_start
+        
+            processing_time = time.time() - start_time
+            self.answer_cache.store(question_embedding, cache_scope, corpus_version, QuestionResponse(
+                question=question,
+                answer="".join(answer_parts),
+                source_documents=source_documents,
+                processing_time=processing_time,
+                timings=timings,
+                context_tokens=context_tokens
+            ))
+            record_ask(timings, processing_time, "answered")
+            yield {"event": "done", "data": {
+                "processing_time": processing_time,
+                "timings": timings,
+                "context_tokens": context_tokens,
+                "retrieval_skipped": False,
+                "cached": False
+            }}
+            
+        except Exception as e:
+            record_ask(timings, time.time() - start_time, "error")
+            logger.error(f"스트리밍 질의응답 처리 중 오류 발생: {e}")
+            raise
+    
+    async def _chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        llm_semaphore: Optional[asyncio.Semaphore] = None
+    ) -> str:
+        """LLM 답변 생성 (세마포어가 있으면 동시 호출 수 제한)"""
+        if llm_semaphore is None:
+            return await self.llm_client.chat_completion(messages, temperature=0.0)
+        async with llm_semaphore:
+            return await self.llm_client.chat_completion(messages, temperature=0.0)
+    
+    async def embed_questions(self, questions: List[str]) -> List[List[float]]:
+        """여러 질문을 한 번의 배치로 임베딩 (캐시에 있는 질문은 제외하고 계산)"""
+        cache_keys = [normalize_question(question) for question in questions]
+        embeddings = [self.query_embedding_cache.get(key) for key in cache_keys]
+        missing = {}
+        for i, (key, embedding) in enumerate(zip(cache_keys, embeddings)):
+            if embedding is None:
+                missing.setdefault(key, []).append(i)
+        
+        if missing:
+            positions = list(missing.values())
+            computed = await run_blocking(
+                self.llm_client.get_embeddings, [questions[indices[0]] for indices in positions]
+            )
+            for key, indices, embedding in zip(missing, positions, computed):
+                embedding = embedding.tolist()
+                self.query_embedding_cache.set(key, embedding)
+                for i in indices:
+                    embeddings[i] = embedding
+        return embeddings
+    
+    async def _embed_question(self, question: str) -> List[float]:
+        """질문 임베딩 (정규화된 질문 텍스트 기준 LRU/TTL 캐시)"""
+        cache_key = normalize_question(question)
+        embedding = self.query_embedding_cache.get(cache_key)
+        if embedding is None:
+            # 로컬 CPU에서 처리, 이벤트 루프를 막지 않도록 워커 풀에서 실행
+            embedding = await run_blocking(self.llm_client.get_embedding, question)
+            self.query_embedding_cache.set(cache_key, embedding)
+        return embedding
+    
+    def _use_hybrid(self, hybrid: Optional[bool]) -> bool:
+        """하이브리드 검색 사용 여부 (요청 값 우선, BM25 색인이 준비된 경우에만)"""
+        requested = hybrid if hybrid is not None else RETRIEVAL_MODE == "hybrid"
+        return requested and lexical_index.ready
+    
+    def _use_rerank(self, rerank: Optional[bool]) -> bool:
+        """재순위화 사용 여부 (요청 값 우선, 없으면 RERANK_ENABLED)"""
+        return rerank if rerank is not None else RERANK_ENABLED
+    
+    async def _retrieve(
+        self,
+        question: str,
+        question_embedding: List[float],
+        document_ids: Optional[List[str]],
+        top_k: int,
+        db: AsyncSession,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        use_hybrid: bool = False,
+        use_rerank: bool = False,
+        expansion_mode: str = "off",
+        timings: Optional[Dict[str, float]] = None,
+        llm_semaphore: Optional[asyncio.Semaphore] = None
+    ) -> List[Dict[str, Any]]:
+        """관련 청크 검색 (벡터 검색 또는 BM25 + 벡터 하이브리드 검색, 선택적으로 질의 확장과 재순위화)"""
+        timings = timings if timings is not None else {}
+        fetch_k = top_k * RERANK_OVERFETCH if use_rerank else top_k
+        use_expansion = expansion_mode != "off"
+        
+        stage_start = time.perf_counter()
+        if not use_hybrid and not use_expansion:
+            chunks = await self._search_relevant_chunks(
+                question_embedding, document_ids, fetch_k, db, ef_search, probes
+            )
+        else:
+            # 여러 검색을 동시에 실행하여 전체 지연이 가장 느린 검색 수준에 머물도록 함
+            candidates = fetch_k * HYBRID_CANDIDATES_MULTIPLIER
+            searches = [
+                self._search_relevant_chunks(
+                    question_embedding, document_ids, candidates, db, ef_search, probes
+                )
+            ]
+            if use_hybrid:
+                searches.append(run_blocking(lexical_index.search, question, candidates, document_ids))
+            if use_expansion:
+                searches.append(self._search_query_variants(
+                    question, expansion_mode, document_ids, candidates, ef_search, probes, use_hybrid,
+                    llm_semaphore
+                ))
+            results = await asyncio.gather(*searches)
+            result_lists = list(results[:2 if use_hybrid else 1])
+            if use_expansion:
+                result_lists.extend(results[-1])
+            chunks = self._reciprocal_rank_fusion(result_lists, fetch_k)
+        timings["search"] = time.perf_counter() - stage_start
+        
+        if use_rerank and len(chunks) > 1:
+            stage_start = time.perf_counter()
+            chunks = await run_blocking(self._rerank, question, chunks, top_k)
+            timings["rerank"] = time.perf_counter() - stage_start
+        
+        return chunks[:top_k]
+    
+    async def _search_query_variants(
+        self,
+        question: str,
+        expansion_mode: str,
+        document_ids: Optional[List[str]],
+        top_k: int,
+        ef_search: Optional[int],
+        probes: Optional[int],
+        use_hybrid: bool,
+        llm_semaphore: Optional[asyncio.Semaphore] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """변형 질문들로 검색한 결과 목록 (QUERY_EXPANSION_DEADLINE 안에 끝난 검색만)
+
+        변형 질문은 한 번에 배치 임베딩하고, 각 검색은 별도 DB 세션에서 동시에 실행합니다.
+        마감 시간을 넘기면 남은 작업은 취소하고 원래 질문의 결과만으로 진행합니다.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + QUERY_EXPANSION_DEADLINE
+        try:
+            variants = await asyncio.wait_for(
+                self.query_expander.expand(question, expansion_mode, llm_semaphore=llm_semaphore),
+                timeout=QUERY_EXPANSION_DEADLINE
+            )
+            if not variants:
+                return []
+            embeddings = await asyncio.wait_for(
+                run_blocking(self.llm_client.get_embeddings, variants),
+                timeout=max(0.0, deadline - loop.time())
+            )
+        except asyncio.TimeoutError:
+            logger.warning("질의 확장 마감 시간 초과: 변형 질문 없이 검색합니다 (LLM 변형 생성은 백그라운드에서 계속)")
+            return []
+        except Exception as e:
+            logger.warning(f"질의 확장 실패, 원래 질문으로만 검색합니다: {e}")
+            return []
+        
+        async def search_variant(variant: str, embedding) -> List[Dict[str, Any]]:
+            # AsyncSession은 동시에 여러 쿼리를 실행할 수 없으므로 검색마다 별도 세션 사용
+            async with async_session() as session:
+                return await self._search_relevant_chunks(
+                    embedding.tolist(), document_ids, top_k, session, ef_search, probes
+                )
+        
+        tasks = [loop.create_task(search_variant(variant, embedding)) for variant, embedding in zip(variants, embeddings)]
+        if use_hybrid:
+            tasks.extend(
+                loop.create_task(run_blocking(lexical_index.search, variant, top_k, document_ids))
+                for variant in variants
+            )
+        done, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - loop.time()))
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"질의 확장 마감 시간 초과: 변형 검색 {len(pending)}/{len(tasks)}개 취소")
+        
+        results = []
+        for task in tasks:
+            if task in done and task.exception() is None:
+                results.append(task.result())
+            elif task in done:
+                logger.warning(f"변형 질문 검색 실패: {task.exception()}")
+        return results
+    
+    def _rerank(self, question: str, chunks: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """크로스 인코더로 (질문, 청크) 쌍을 한 번에 점수화하여 상위 top_k개 선택"""
+        cross_encoder = model_registry.get_cross_encoder(RERANK_MODEL)
+        scores = cross_encoder.predict(
+            [(question, chunk["content"]) for chunk in chunks],
+            batch_size=RERANK_BATCH_SIZE,
+            show_progress_bar=False
+        )
+        ranked = sorted(zip(chunks, scores), key=lambda item: float(item[1]), reverse=True)
+        return [{**chunk, "rerank_score": float(score)} for chunk, score in ranked[:top_k]]
+    
+    @staticmethod
+    def _reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+        """여러 검색 결과를 순위 기반(RRF)으로 결합
+
+        similarity_score는 벡터 검색에서 얻은 코사인 유사도를 유지하고(어휘 검색에만 나온 청크는 0),
+        결합 점수는 rrf_score에 기록합니다.
+        """
+        fused: Dict[str, Dict[str, Any]] = {}
+        for results in result_lists:
+            for rank, chunk in enumerate(results, 1):
+                entry = fused.get(chunk["id"])
+                if entry is None:
+                    entry = {**chunk, "rrf_score": 0.0}
+                    entry.setdefault("similarity_score", 0.0)
+                    fused[chunk["id"]] = entry
+                elif "similarity_score" in chunk:
+                    entry["similarity_score"] = chunk["similarity_score"]
+                entry["rrf_score"] += 1.0 / (RRF_K + rank)
+        
+        return sorted(fused.values(), key=lambda chunk: chunk["rrf_score"], reverse=True)[:top_k]
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """캐시 통계"""
+        return {
+            "query_embedding_cache": self.query_embedding_cache.stats(),
+            "answer_cache": self.answer_cache.stats(),
+            "lexical_index": lexical_index.stats(),
+            "retrieval_gate": self.retrieval_gate.stats()
+        }
+    
     async def _search_relevant_chunks(
         self, 
         question_embedding: List[float], 
         document_ids: Optional[List[str]], 
         top_k: int, 
-        db: AsyncSession
+        db: AsyncSession,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """관련 문서 청크 검색"""
         try:
-            # 기본 쿼리
-            base_query = """
-                SELECT 
-                    dc.id,
-                    dc.document_id,
-                    dc.chunk_index,
-                    dc.content,
-                    dc.metadata,
-                    d.filename,
-                    1 - (dc.embedding <=> :question_embedding) as similarity_score
-                FROM document_chunks dc
-                JOIN documents d ON dc.document_id = d.id
-            """
+            # 메모리 벡터 인덱스가 준비되어 있으면 DB 왕복 없이 검색
+            if vector_index.ready:
+                chunks = await run_blocking(vector_index.search, question_embedding, top_k, document_ids)
+                return await vector_index.attach_content(chunks, db)
             
-            # 문서 ID 필터링 추가
-            if document_ids:
-                base_query += " WHERE dc.document_id = ANY(:document_ids)"
-                params = {
-                    "question_embedding": f"[{','.join(map(str, question_embedding))}]",
-                    "document_ids": document_ids
-                }
-            else:
-                params = {"question_embedding": f"[{','.join(map(str, question_embedding))}]"}
+            # 이번 검색 트랜잭션에만 적용되는 인덱스 검색 파라미터 (HNSW는 ef_search가 top_k 이상이어야 함)
+            await apply_search_params(db, ef_search, probes, limit=top_k)
             
-            # 유사도 순으로 정렬하고 top_k 개만 선택
-            final_query = base_query + """
-                ORDER BY similarity_score DESC
-                LIMIT :limit
-            """
-            
-            params["limit"] = top_k
+            params = {
+                "question_embedding": format_vector(question_embedding),
+                "limit": top_k
+            }
+            if document_ids:
+                params["document_ids"] = document_ids
             
-            result = await db.execute(text(final_query), params)
+            result = await db.execute(text(build_vector_search_query(bool(document_ids))), params)
             
             chunks = []
             for row in result:
@@ -127,16 +677,70 @@ class QAService:
             logger.error(f"문서 청크 검색 중 오류 발생: {e}")
             raise
     
-    def _build_context(self, chunks: List[Dict[str, Any]]) -> str:
-        """검색된 청크들로부터 컨텍스트 구성"""
-        context_parts = []
+    def _select_context_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """검색 순위대로 CONTEXT_TOKEN_BUDGET 안에 들어가는 청크 선택
+
+        같은 청크는 한 번만 포함하고, 예산을 넘는 청크는 건너뛰되 뒤의 더 짧은 청크는 계속 시도합니다.
+        최상위 청크는 예산과 관계없이 항상 포함합니다.
+        """
+        selected = []
+        seen_ids = set()
+        used_tokens = 0
+        for chunk in chunks:
+            if chunk["id"] in seen_ids:
+                continue
+            tokens = estimate_tokens(chunk["content"])
+            if selected and used_tokens + tokens > CONTEXT_TOKEN_BUDGET:
+                continue
+            selected.append(chunk)
+            seen_ids.add(chunk["id"])
+            used_tokens += tokens
+        return selected
+    
+    def _build_context(self, chunks: List[Dict[str, Any]]) -> Tuple[str, int]:
+        """검색된 청크들로부터 컨텍스트 구성 (컨텍스트, 추정 토큰 수)
+
+        같은 문서에서 chunk_index가 연속된 청크는 하나의 구간으로 병합하고
+        분할기의 chunk_overlap으로 생긴 중복 텍스트를 제거합니다.
+        구간은 포함된 청크 중 가장 높은 검색 순위 순서로 나열합니다.
+        """
+        sections: List[Dict[str, Any]] = []
+        by_document: Dict[str, List[Dict[str, Any]]] = {}
+        for rank, chunk in enumerate(chunks):
+            by_document.setdefault(chunk["document_id"], []).append({**chunk, "_rank": rank})
         
-        for i, chunk in enumerate(chunks, 1):
+        for document_chunks in by_document.values():
+            document_chunks.sort(key=lambda chunk: chunk["chunk_index"])
+            section = None
+            for chunk in document_chunks:
+                if section is not None and chunk["chunk_index"] == section["last_index"] + 1:
+                    stripped = strip_overlap(section["last_content"], chunk["content"])
+                    # 겹친 부분이 없으면 앞 청크 끝과 이어 붙지 않도록 구분자 삽입
+                    if len(stripped) == len(chunk["content"]):
+                        stripped = CONTEXT_CHUNK_SEPARATOR + stripped
+                    section["parts"].append(stripped)
+                    section["last_content"] = chunk["content"]
+                    section["last_index"] = chunk["chunk_index"]
+                    section["rank"] = min(section["rank"], chunk["_rank"])
+                    continue
+                section = {
+                    "filename": chunk["filename"],
+                    "parts": [chunk["content"]],
+                    "last_content": chunk["content"],
+                    "last_index": chunk["chunk_index"],
+                    "rank": chunk["_rank"]
+                }
+                sections.append(section)
+        
+        sections.sort(key=lambda section: section["rank"])
+        context_parts = []
+        for i, section in enumerate(sections, 1):
             context_parts.append(
-                f"[문서 {i}: {chunk['filename']}]\n{chunk['content']}\n"
+                f"[문서 {i}: {section['filename']}]\n{''.join(section['parts'])}\n"
             )
         
-        return "\n".join(context_parts)
+        context = "\n".join(context_parts)
+        return context, estimate_tokens(context)
     
     async def _build_source_documents(
         self, 
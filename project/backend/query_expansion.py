@@ -0,0 +1,165 @@
+import os
+import re
+import asyncio
+import logging
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+
+from cache import TTLCache, normalize_question
+
+logger = logging.getLogger(__name__)
+
+# 질의 확장 설정
+# - QUERY_EXPANSION: off (기본값) | synonyms (용어 사전의 동의어/연관 키워드로 변형) | llm (LLM이 바꿔 쓴 질문)
+# - QUERY_EXPANSION_VARIANTS: 원래 질문 외에 추가로 검색할 변형 질문 수
+# - QUERY_EXPANSION_DEADLINE: 변형 생성과 검색에 허용하는 최대 추가 시간 (초)
+#   llm 모드에서 생성이 마감 시간을 넘기면 이번 요청은 원래 질문으로만 검색하고,
+#   생성은 백그라운드에서 끝나 같은 질문의 다음 요청부터 사용됩니다.
+# - QUERY_EXPANSION_SYNONYMS_PATH: synonyms 모드에서 사용할 용어 사전 파일
+QUERY_EXPANSION = os.getenv("QUERY_EXPANSION", "off").lower()
+QUERY_EXPANSION_VARIANTS = int(os.getenv("QUERY_EXPANSION_VARIANTS", "3"))
+QUERY_EXPANSION_DEADLINE = float(os.getenv("QUERY_EXPANSION_DEADLINE", "2.0"))
+QUERY_EXPANSION_SYNONYMS_PATH = os.getenv(
+    "QUERY_EXPANSION_SYNONYMS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "finance-keywords.txt")
+)
+
+# 정의 문장의 주어("시가총액은 ...")를 한국어 용어로 사용
+_DEFINITION_SUBJECT = re.compile(r"^(.+?)(?:은|는)\s")
+# LLM 응답에서 목록 번호/기호 제거
+_LIST_MARKER = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s*")
+
+
+def load_synonym_groups(path: str) -> List[Dict[str, List[str]]]:
+    """용어 사전 파일에서 동의어 그룹 목록 읽기
+
+    파일은 빈 줄로 구분된 항목으로 이루어지며, 항목의 첫 줄은 용어, 이어서
+    "정의:", "예시:", "연관키워드: a, b, c" 줄이 옵니다.
+    그룹의 terms는 같은 개념의 표기(용어, 정의 문장의 한국어 용어), keywords는 연관 키워드입니다.
+    """
+    groups = []
+    group: Optional[Dict[str, List[str]]] = None
+    with open(path, encoding="utf-8") as f:
+        for line in (line.strip() for line in f):
+            if not line or line.startswith("예시:"):
+                continue
+            if group is None:
+                group = {"terms": [line], "keywords": []}
+            elif line.startswith("정의:"):
+                match = _DEFINITION_SUBJECT.match(line[len("정의:"):].strip())
+                if match and match.group(1) not in group["terms"]:
+                    group["terms"].append(match.group(1))
+            elif line.startswith("연관키워드:"):
+                group["keywords"] = [
+                    keyword.strip() for keyword in line[len("연관키워드:"):].split(",") if keyword.strip()
+                ]
+                groups.append(group)
+                group = None
+    return groups
+
+
+class QueryExpander:
+    """질문을 여러 변형 질문으로 확장
+
+    synonyms 모드는 질문에 포함된 사전 용어를 다른 표기로 바꾸거나 연관 키워드를 덧붙이고,
+    llm 모드는 LLM에게 같은 의미의 다른 표현을 요청합니다. 같은 질문의 변형은 캐시합니다.
+    LLM 생성은 호출자가 마감 시간으로 기다리기를 그만둬도 백그라운드에서 끝까지 실행되어
+    캐시를 채우고, 같은 질문의 동시 요청은 진행 중인 생성 하나를 함께 기다립니다.
+    """
+
+    def __init__(self, llm_client, synonyms_path: str = QUERY_EXPANSION_SYNONYMS_PATH):
+        self.llm_client = llm_client
+        self.synonyms_path = synonyms_path
+        self._synonym_groups: Optional[List[Dict[str, List[str]]]] = None
+        self._cache = TTLCache(maxsize=1024, ttl=3600.0)
+        self._pending: Dict[Tuple[str, int, str], asyncio.Task] = {}
+
+    @property
+    def synonym_groups(self) -> List[Dict[str, List[str]]]:
+        """동의어 그룹 (최초 사용 시 파일에서 로드, 파일이 없으면 빈 목록)"""
+        if self._synonym_groups is None:
+            try:
+                self._synonym_groups = load_synonym_groups(self.synonyms_path)
+                logger.info(f"질의 확장 용어 사전 로드: {len(self._synonym_groups)}개 용어 ({self.synonyms_path})")
+            except OSError as e:
+                logger.warning(f"질의 확장 용어 사전을 읽을 수 없습니다: {e}")
+                self._synonym_groups = []
+        return self._synonym_groups
+
+    async def expand(
+        self,
+        question: str,
+        mode: str,
+        count: int = QUERY_EXPANSION_VARIANTS,
+        llm_semaphore: Optional[asyncio.Semaphore] = None
+    ) -> List[str]:
+        """원래 질문을 제외한 변형 질문 최대 count개 (llm_semaphore가 있으면 LLM 호출 동시 실행 수 제한)"""
+        if mode == "off" or count <= 0:
+            return []
+
+        cache_key = (mode, count, normalize_question(question))
+        variants = self._cache.get(cache_key)
+        if variants is not None:
+            return variants
+        if mode == "synonyms":
+            variants = self._expand_with_synonyms(question, count)
+            self._cache.set(cache_key, variants)
+            return variants
+
+        task = self._pending.get(cache_key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._expand_with_llm(question, count, llm_semaphore))
+            self._pending[cache_key] = task
+            task.add_done_callback(lambda done: self._finish_llm_expansion(cache_key, done))
+        # 호출자가 취소(마감 시간 초과)되어도 생성 작업은 취소하지 않음
+        return await asyncio.shield(task)
+
+    def _finish_llm_expansion(self, cache_key: Tuple[str, int, str], task: asyncio.Task) -> None:
+        """백그라운드 LLM 변형 생성 완료 시 캐시에 저장"""
+        self._pending.pop(cache_key, None)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.warning(f"LLM 질의 확장 실패: {task.exception()}")
+            return
+        self._cache.set(cache_key, task.result())
+
+    def _expand_with_synonyms(self, question: str, count: int) -> List[str]:
+        lowered = question.lower()
+        variants: List[str] = []
+        for group in self.synonym_groups:
+            matched = next((term for term in group["terms"] if term.lower() in lowered), None)
+            if matched is None:
+                continue
+            start = lowered.index(matched.lower())
+            # 다른 표기(영문 <-> 한국어)로 바꾼 질문, 연관 키워드를 덧붙인 질문
+            for alternative in group["terms"]:
+                if alternative != matched:
+                    variants.append(question[:start] + alternative + question[start + len(matched):])
+            if group["keywords"]:
+                variants.append(f"{question} {' '.join(group['keywords'])}")
+        return _unique_variants(question, variants)[:count]
+
+    async def _expand_with_llm(
+        self,
+        question: str,
+        count: int,
+        llm_semaphore: Optional[asyncio.Semaphore] = None
+    ) -> List[str]:
+        messages = self.llm_client.format_messages_for_query_expansion(question, count)
+        async with llm_semaphore or nullcontext():
+            response = await self.llm_client.chat_completion(messages, temperature=0.3)
+        variants = [_LIST_MARKER.sub("", line).strip() for line in response.splitlines()]
+        return _unique_variants(question, variants)[:count]
+
+
+def _unique_variants(question: str, variants: List[str]) -> List[str]:
+    """빈 변형과 원래 질문/서로 같은 변형 제거 (순서 유지)"""
+    seen = {normalize_question(question)}
+    unique = []
+    for variant in variants:
+        key = normalize_question(variant)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(variant)
+    return unique
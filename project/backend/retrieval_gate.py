@@ -0,0 +1,142 @@
+import os
+import re
+import asyncio
+import logging
+import unicodedata
+from contextlib import nullcontext
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from executor import run_blocking
+from vector_index import _normalize_rows
+
+logger = logging.getLogger(__name__)
+
+# 검색 필요 여부 판단 설정
+# - RETRIEVAL_GATE: off (항상 검색) | local (규칙 + 임베딩 분류, 기본값) | llm (local로 애매한 질문은 LLM에 확인)
+# - RETRIEVAL_GATE_THRESHOLD: 잡담 예시 문장과의 코사인 유사도가 이 값 이상이어야 검색 생략 후보
+# - RETRIEVAL_GATE_MARGIN: 잡담 유사도가 문서 질문 유사도보다 이만큼 높아야 검색 생략
+RETRIEVAL_GATE = os.getenv("RETRIEVAL_GATE", "local").lower()
+RETRIEVAL_GATE_THRESHOLD = float(os.getenv("RETRIEVAL_GATE_THRESHOLD", "0.8"))
+RETRIEVAL_GATE_MARGIN = float(os.getenv("RETRIEVAL_GATE_MARGIN", "0.1"))
+
+# 이 길이(공백 제외 글자 수)를 넘는 질문은 잡담으로 보지 않음
+MAX_SMALL_TALK_LENGTH = 30
+
+# 인사, 감사, 서비스 자체에 대한 질문 (문장 전체가 일치해야 함)
+# 질문과 같은 방식(NFKC)으로 정규화해야 "ㅋ", "ㅎ" 같은 호환 자모도 일치함
+_SMALL_TALK_PATTERNS = [re.compile(unicodedata.normalize("NFKC", pattern)) for pattern in (
+    r"^(안녕|안녕하세요|안녕하십니까|반가워요?|반갑습니다|하이|ㅎㅇ|hi|hello|hey|좋은 ?(아침|하루)(이에요|입니다)?)$",
+    r"^(고마워요?|감사해요|감사합니다|땡큐|thanks?( you)?|thank you)$",
+    r"^(잘 ?가|잘 ?있어|수고(하세요|하셨습니다)|bye|goodbye)$",
+    r"^(너는?|당신은?) ?(누구(야|니|세요|인가요)|뭐(야|니|예요))$",
+    r"^(누구(야|세요)|이름이 뭐(야|예요|에요))$",
+    r"^(뭘|무엇을|어떤 걸) ?(할 ?수 ?있(어|나요|어요|니))$",
+    r"^(who are you|what can you do|what is your name)$",
+    r"^(ㅋ+|ㅎ+|ㅠ+|ㅜ+|네|넵|응|ok|okay|오케이|알겠(어|어요|습니다))$",
+)]
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.~,;:^]+$")
+
+# 임베딩 분류기의 기준 문장
+SMALL_TALK_EXAMPLES = [
+    "안녕하세요", "반갑습니다", "감사합니다", "고마워요", "좋은 하루 보내세요",
+    "당신은 누구인가요", "무엇을 도와줄 수 있나요", "오늘 기분 어때요",
+    "hello", "hi there", "thank you", "who are you", "what can you do", "how are you",
+]
+RETRIEVAL_EXAMPLES = [
+    "연회비는 얼마인가요", "해외 결제 수수료가 궁금합니다", "포인트 적립 조건을 알려주세요",
+    "카드 분실 시 어떻게 신고하나요", "문서에서 계약 기간을 찾아주세요", "이 약관의 해지 조건은 무엇인가요",
+    "what is the annual fee", "how do I report a lost card", "summarize the terms and conditions",
+    "what are the eligibility requirements",
+]
+
+
+def _normalize(question: str) -> str:
+    normalized = unicodedata.normalize("NFKC", question).lower().strip()
+    return " ".join(_TRAILING_PUNCTUATION.sub("", normalized).split())
+
+
+def is_small_talk(question: str) -> bool:
+    """인사/감사/서비스 자체에 대한 질문인지 규칙으로 판단"""
+    normalized = _normalize(question)
+    if not normalized or len(normalized.replace(" ", "")) > MAX_SMALL_TALK_LENGTH:
+        return False
+    return any(pattern.match(normalized) for pattern in _SMALL_TALK_PATTERNS)
+
+
+class RetrievalGate:
+    """질문에 문서 검색이 필요한지 판단
+
+    1. 규칙: 인사·감사·메타 질문과 문장 전체가 일치하면 검색 생략
+    2. 임베딩 분류: 질문 임베딩과 잡담/문서 질문 기준 문장의 최대 유사도를 비교
+    3. llm 모드에서는 2의 결과가 애매한 짧은 질문만 LLM에 확인
+    판단이 불확실하면 항상 검색합니다.
+    """
+
+    def __init__(self, llm_client, mode: str = RETRIEVAL_GATE):
+        self.llm_client = llm_client
+        self.mode = mode
+        self._small_talk_prototypes: Optional[np.ndarray] = None
+        self._retrieval_prototypes: Optional[np.ndarray] = None
+        self.counts = {"retrieve": 0, "skip_rule": 0, "skip_embedding": 0, "skip_llm": 0, "llm_checks": 0}
+
+    async def needs_retrieval(
+        self,
+        question: str,
+        question_embedding: Sequence[float],
+        llm_semaphore: Optional[asyncio.Semaphore] = None
+    ) -> bool:
+        if self.mode == "off":
+            return True
+
+        if is_small_talk(question):
+            self.counts["skip_rule"] += 1
+            return False
+
+        if len(question.replace(" ", "")) > MAX_SMALL_TALK_LENGTH:
+            self.counts["retrieve"] += 1
+            return True
+
+        small_talk_score, retrieval_score = await self._prototype_scores(question_embedding)
+        if small_talk_score >= RETRIEVAL_GATE_THRESHOLD and small_talk_score - retrieval_score >= RETRIEVAL_GATE_MARGIN:
+            self.counts["skip_embedding"] += 1
+            return False
+
+        if self.mode == "llm" and small_talk_score > retrieval_score:
+            self.counts["llm_checks"] += 1
+            if not await self._llm_needs_retrieval(question, llm_semaphore):
+                self.counts["skip_llm"] += 1
+                return False
+
+        self.counts["retrieve"] += 1
+        return True
+
+    async def _prototype_scores(self, question_embedding: Sequence[float]) -> Tuple[float, float]:
+        """잡담 기준 문장, 문서 질문 기준 문장과의 최대 코사인 유사도"""
+        if self._small_talk_prototypes is None:
+            # 기준 문장 임베딩은 최초 한 번만 계산
+            embeddings = await run_blocking(self.llm_client.get_embeddings, SMALL_TALK_EXAMPLES + RETRIEVAL_EXAMPLES)
+            embeddings = _normalize_rows(embeddings)
+            self._retrieval_prototypes = embeddings[len(SMALL_TALK_EXAMPLES):]
+            self._small_talk_prototypes = embeddings[:len(SMALL_TALK_EXAMPLES)]
+
+        query = np.asarray(question_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        return float(np.max(self._small_talk_prototypes @ query)), float(np.max(self._retrieval_prototypes @ query))
+
+    async def _llm_needs_retrieval(self, question: str, llm_semaphore: Optional[asyncio.Semaphore] = None) -> bool:
+        try:
+            messages = self.llm_client.format_messages_for_retrieval_check(question)
+            async with llm_semaphore or nullcontext():
+                response = await self.llm_client.chat_completion(messages, temperature=0.0)
+            return not response.strip().upper().startswith("N")
+        except Exception as e:
+            logger.warning(f"검색 필요 여부 LLM 확인 실패, 검색을 진행합니다: {e}")
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": self.mode, **self.counts}
+
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+벡터 검색 실행 계획 회귀 테스트 스크립트
+
+QAService가 사용하는 검색 쿼리를 EXPLAIN하여 pgvector 인덱스가
+ORDER BY ... LIMIT을 처리하는지(전체 순차 스캔이 아닌지) 확인하고,
+문서 필터 검색이 해당 문서의 청크를 LIMIT개까지 모두 반환하는지 확인합니다.
+DATABASE_URL이 가리키는 데이터베이스가 init_db로 초기화되어 있어야 합니다.
+
+실행: python test_vector_search.py
+"""
+
+import sys
+import json
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+
+from database import engine, format_vector, EMBEDDING_DIMENSION, VECTOR_INDEX_NAME
+from qa_service import build_vector_search_query
+
+# 검색 결과 수 (QuestionRequest.top_k 기본값)
+SEARCH_LIMIT = 5
+
+
+def _find_index_scans(plan: Dict[str, Any]) -> List[str]:
+    """실행 계획 트리에서 인덱스 스캔에 사용된 인덱스 이름 수집"""
+    index_names = []
+    if plan.get("Index Name"):
+        index_names.append(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        index_names.extend(_find_index_scans(child))
+    return index_names
+
+
+async def _vector_index_exists(conn) -> bool:
+    result = await conn.execute(
+        text("SELECT indexdef FROM pg_indexes WHERE indexname = :name"),
+        {"name": VECTOR_INDEX_NAME}
+    )
+    return result.scalar() is not None
+
+
+class VectorSearchPlanTester:
+    """벡터 검색 실행 계획 테스트 클래스"""
+
+    def __init__(self):
+        self.passed_tests = 0
+        self.failed_tests = 0
+        self.skipped_tests = 0
+
+    async def _explain(self) -> Optional[Dict[str, Any]]:
+        """필터 없는 검색 쿼리의 실행 계획(JSON) 조회"""
+        query_embedding = np.random.default_rng(0).standard_normal(EMBEDDING_DIMENSION)
+        params = {"question_embedding": format_vector(query_embedding), "limit": SEARCH_LIMIT}
+
+        async with engine.begin() as conn:
+            if not await _vector_index_exists(conn):
+                return None
+
+            # 작은 테이블에서는 플래너가 순차 스캔을 고를 수 있으므로, 인덱스로 처리 가능한 쿼리인지만 확인
+            await conn.execute(text("SET LOCAL enable_seqscan = off"))
+            result = await conn.execute(
+                text("EXPLAIN (FORMAT JSON) " + build_vector_search_query(False)),
+                params
+            )
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return plan[0]["Plan"]
+
+    async def test_index_used(self) -> None:
+        """필터 없는 검색 쿼리가 벡터 인덱스를 사용하는지 테스트"""
+        print("🔍 인덱스 사용 (문서 필터 없음)...")
+        try:
+            plan = await self._explain()
+            if plan is None:
+                print(f"⏭️  건너뜀: {VECTOR_INDEX_NAME} 인덱스가 없습니다 (VECTOR_INDEX_TYPE 설정 확인)")
+                self.skipped_tests += 1
+                return
+
+            index_names = _find_index_scans(plan)
+            if VECTOR_INDEX_NAME in index_names:
+                print(f"✅ 통과: 인덱스 스캔 사용 ({', '.join(index_names)})")
+                self.passed_tests += 1
+            else:
+                print(f"❌ 실패: 벡터 인덱스를 사용하지 않음 (사용된 인덱스: {index_names or '없음'})")
+                print(json.dumps(plan, indent=2, ensure_ascii=False))
+                self.failed_tests += 1
+        except Exception as e:
+            print(f"❌ 실패: {e}")
+            self.failed_tests += 1
+
+    async def test_filtered_results(self) -> None:
+        """문서 필터 검색이 LIMIT개를 모두 반환하는지 테스트
+
+        ANN 인덱스 스캔 뒤에 문서 필터를 적용하면 후보(ef_search개) 중 해당 문서의 청크만 남아
+        결과가 LIMIT보다 적어집니다. 인덱스 사용을 강제한 상태에서 청크가 LIMIT개 이상인
+        가장 작은 문서로 검색해 결과 수를 확인합니다.
+        """
+        print("🔍 문서 필터 검색 결과 수...")
+        query_embedding = np.random.default_rng(0).standard_normal(EMBEDDING_DIMENSION)
+        try:
+            async with engine.begin() as conn:
+                result = await conn.execute(text("""
+                    SELECT document_id
+                    FROM document_chunks
+                    WHERE embedding IS NOT NULL
+                    GROUP BY document_id
+                    HAVING COUNT(*) >= :limit
+                    ORDER BY COUNT(*)
+                    LIMIT 1
+                """), {"limit": SEARCH_LIMIT})
+                document_id = result.scalar()
+                if document_id is None:
+                    print(f"⏭️  건너뜀: 청크가 {SEARCH_LIMIT}개 이상인 문서가 없습니다")
+                    self.skipped_tests += 1
+                    return
+
+                await conn.execute(text("SET LOCAL enable_seqscan = off"))
+                result = await conn.execute(text(build_vector_search_query(True)), {
+                    "question_embedding": format_vector(query_embedding),
+                    "limit": SEARCH_LIMIT,
+                    "document_ids": [document_id]
+                })
+                rows = result.fetchall()
+
+            if len(rows) == SEARCH_LIMIT and all(row.document_id == document_id for row in rows):
+                print(f"✅ 통과: 문서 {document_id}에서 {len(rows)}개 청크 반환")
+                self.passed_tests += 1
+            else:
+                print(f"❌ 실패: 문서 {document_id}에서 {len(rows)}개 청크 반환 (기대값: {SEARCH_LIMIT})")
+                self.failed_tests += 1
+        except Exception as e:
+            print(f"❌ 실패: {e}")
+            self.failed_tests += 1
+
+    async def run_all_tests(self) -> bool:
+        """모든 테스트 실행"""
+        print("=== 벡터 검색 실행 계획 테스트 시작 ===")
+        await self.test_index_used()
+        await self.test_filtered_results()
+        await engine.dispose()
+
+        print(f"\n결과: 통과 {self.passed_tests}, 실패 {self.failed_tests}, 건너뜀 {self.skipped_tests}")
+        return self.failed_tests == 0
+
+
+if __name__ == "__main__":
+    success = asyncio.run(VectorSearchPlanTester().run_all_tests())
+    sys.exit(0 if success else 1)
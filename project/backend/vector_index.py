@@ -0,0 +1,393 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session, parse_vector
+from executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+# 메모리 벡터 인덱스 설정
+# - IN_MEMORY_INDEX: true면 검색을 DB 대신 프로세스 내 인덱스에서 수행 (DB는 계속 원본 데이터 저장소)
+# - VECTOR_INDEX_PATH: 인덱스 파일 디렉터리 (시작 시 메모리 매핑으로 로드)
+# - IN_MEMORY_IVF_THRESHOLD: 이 행 수 이상이면 IVF(역색인) 구조로 후보를 줄여 검색
+IN_MEMORY_INDEX = os.getenv("IN_MEMORY_INDEX", "false").lower() == "true"
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "data/vector_index")
+IN_MEMORY_IVF_THRESHOLD = int(os.getenv("IN_MEMORY_IVF_THRESHOLD", "200000"))
+IN_MEMORY_IVF_NPROBE = int(os.getenv("IN_MEMORY_IVF_NPROBE", "8"))
+# 변경 후 이 시간(초) 동안 모인 변경을 한 번에 파일로 저장
+VECTOR_INDEX_SAVE_DELAY = float(os.getenv("VECTOR_INDEX_SAVE_DELAY", "30"))
+
+# 삭제된 행 비율이 이 값을 넘으면 행렬을 압축
+COMPACT_RATIO = 0.2
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class InMemoryVectorIndex:
+    """document_chunks를 복제한 프로세스 내 벡터 인덱스 (읽기 전용 복제본)
+
+    정규화된 float32 행렬에 대해 행렬곱으로 코사인 유사도를 계산하고 top-k를 고릅니다.
+    행 수가 IN_MEMORY_IVF_THRESHOLD 이상이면 k-means 중심점으로 후보 리스트를 나눈 IVF 구조를
+    사용해 질의와 가까운 IN_MEMORY_IVF_NPROBE개 리스트만 검사합니다.
+
+    변경은 이벤트 루프 스레드에서만 일어나고 배열은 항상 새 객체로 교체되므로,
+    워커 스레드의 검색은 시작 시점의 배열 참조를 그대로 사용합니다.
+    청크 본문은 보관하지 않고(원본은 Postgres), 검색된 top-k의 본문만 attach_content로 조회합니다.
+    임베딩 행렬은 용량을 두 배씩 늘리는 버퍼의 앞부분 뷰이며, 새 행은 기존 뷰 밖에만 쓰므로
+    검색 중인 뷰에 영향을 주지 않습니다. IVF 구조는 워커 스레드에서 학습한 뒤 한 번에 교체합니다.
+    """
+
+    def __init__(self, path: str = VECTOR_INDEX_PATH):
+        self.path = path
+        self.ready = False
+        self._buffer = np.zeros((0, 0), dtype=np.float32)
+        self._embeddings = self._buffer
+        self._alive = np.zeros(0, dtype=bool)
+        self._document_ids = np.zeros(0, dtype=object)
+        self._records: List[Dict[str, Any]] = []
+        # (중심점, 행별 리스트 번호): 검색이 항상 짝이 맞는 값을 보도록 하나의 튜플로 교체
+        self._ivf: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._ivf_built_rows = 0
+        # 행 번호가 바뀌는 재구성(_replace)마다 증가, 학습 중 재구성되면 결과를 버림
+        self._generation = 0
+        self._ivf_task: Optional[asyncio.Task] = None
+        self._save_task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._flush_requested = asyncio.Event()
+
+    @property
+    def size(self) -> int:
+        return int(self._alive.sum())
+
+    async def load_or_build(self) -> None:
+        """파일에서 메모리 매핑으로 로드하고, 없거나 DB와 행 수가 다르면 DB에서 다시 구성"""
+        start_time = time.time()
+        async with async_session() as db:
+            result = await db.execute(text("SELECT COUNT(*) FROM document_chunks WHERE embedding IS NOT NULL"))
+            db_count = result.scalar()
+
+        loaded = await run_blocking(self._load)
+        if not loaded or self.size != db_count:
+            if loaded:
+                logger.info(f"메모리 인덱스와 DB 행 수가 다름 ({self.size} != {db_count}), DB에서 다시 구성")
+            await self._build_from_db()
+            await run_blocking(self._save)
+
+        await self._build_ivf()
+        self.ready = True
+        logger.info(f"메모리 벡터 인덱스 준비 완료: {self.size}개 청크 ({time.time() - start_time:.2f}초)")
+
+    async def _build_from_db(self) -> None:
+        embeddings: List[np.ndarray] = []
+        records: List[Dict[str, Any]] = []
+        async with async_session() as db:
+            result = await db.stream(text("""
+                SELECT dc.id, dc.document_id, dc.chunk_index, dc.metadata,
+                       dc.embedding::text as embedding, d.filename
+                FROM document_chunks dc
+                JOIN documents d ON dc.document_id = d.id
+                WHERE dc.embedding IS NOT NULL
+            """))
+            async for partition in result.partitions(5000):
+                for row in partition:
+                    embeddings.append(parse_vector(row.embedding))
+                    records.append({
+                        "id": str(row.id),
+                        "document_id": str(row.document_id),
+                        "chunk_index": row.chunk_index,
+                        "metadata": row.metadata,
+                        "filename": row.filename
+                    })
+
+        matrix = _normalize_rows(np.stack(embeddings)) if embeddings else np.zeros((0, 0), dtype=np.float32)
+        self._replace(matrix, records)
+
+    def _replace(self, matrix: np.ndarray, records: List[Dict[str, Any]]) -> None:
+        self._buffer = matrix
+        self._embeddings = matrix
+        self._records = records
+        self._alive = np.ones(len(records), dtype=bool)
+        self._document_ids = np.array([record["document_id"] for record in records], dtype=object)
+        self._ivf = None
+        self._ivf_built_rows = 0
+        self._generation += 1
+
+    def _append_rows(self, new_matrix: np.ndarray) -> np.ndarray:
+        """버퍼 끝에 행을 추가하고 유효 구간 뷰 반환
+
+        용량이 부족하거나 버퍼가 읽기 전용 메모리 맵이면 두 배 용량의 새 버퍼로 한 번 복사하므로,
+        업로드마다 전체 행렬을 복사하지 않습니다.
+        """
+        rows = self._embeddings.shape[0]
+        needed = rows + new_matrix.shape[0]
+        buffer = self._buffer
+        if (
+            buffer.shape[0] < needed
+            or buffer.ndim != 2 or buffer.shape[1] != new_matrix.shape[1]
+            or not buffer.flags.writeable
+        ):
+            capacity = max(needed, 2 * buffer.shape[0], 1024)
+            grown = np.empty((capacity, new_matrix.shape[1]), dtype=np.float32)
+            if rows:
+                grown[:rows] = self._embeddings
+            buffer = self._buffer = grown
+        buffer[rows:needed] = new_matrix
+        return buffer[:needed]
+
+    def _load(self) -> bool:
+        embeddings_path = os.path.join(self.path, "embeddings.npy")
+        records_path = os.path.join(self.path, "records.json")
+        if not (os.path.exists(embeddings_path) and os.path.exists(records_path)):
+            return False
+        try:
+            matrix = np.load(embeddings_path, mmap_mode="r")
+            with open(records_path, encoding="utf-8") as f:
+                records = json.load(f)
+            if len(records) != matrix.shape[0]:
+                return False
+            self._replace(matrix, records)
+            return True
+        except Exception as e:
+            logger.warning(f"메모리 인덱스 파일 로드 실패: {e}")
+            return False
+
+    def _save(self) -> None:
+        """삭제된 행을 제외하고 파일로 저장 (임시 파일에 쓴 뒤 교체)"""
+        os.makedirs(self.path, exist_ok=True)
+        # 저장 중에도 이벤트 루프에서 행이 추가될 수 있으므로 같은 행 수까지만 저장
+        embeddings, all_records, alive = self._embeddings, self._records, self._alive
+        rows = min(embeddings.shape[0], len(all_records), len(alive))
+        alive = alive[:rows]
+        matrix = np.asarray(embeddings[:rows])[alive] if rows else embeddings
+        records = [record for record, keep in zip(all_records[:rows], alive) if keep]
+
+        embeddings_tmp = os.path.join(self.path, "embeddings.tmp.npy")
+        records_tmp = os.path.join(self.path, "records.tmp.json")
+        np.save(embeddings_tmp, matrix)
+        with open(records_tmp, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False)
+        os.replace(embeddings_tmp, os.path.join(self.path, "embeddings.npy"))
+        os.replace(records_tmp, os.path.join(self.path, "records.json"))
+
+    def _schedule_save(self) -> None:
+        """변경 사항을 VECTOR_INDEX_SAVE_DELAY초 동안 모아 백그라운드에서 한 번에 저장
+
+        업로드마다 전체 행렬을 다시 쓰지 않도록 저장을 늦추며, 저장 중에 생긴 변경은 다음 저장에 반영합니다.
+        저장 전에 종료되어도 시작 시 DB와 행 수가 다르면 다시 구성하므로 데이터는 유실되지 않습니다.
+        """
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_task = asyncio.get_running_loop().create_task(self._save_pending())
+
+    async def _save_pending(self) -> None:
+        while self._dirty:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), VECTOR_INDEX_SAVE_DELAY)
+            except asyncio.TimeoutError:
+                pass
+            self._dirty = False
+            try:
+                await run_blocking(self._save)
+            except Exception as e:
+                logger.error(f"메모리 인덱스 저장 실패: {e}")
+
+    async def flush(self) -> None:
+        """예약된 저장을 지연 없이 바로 수행하고 끝날 때까지 대기 (애플리케이션 종료 시)"""
+        if self._save_task is not None and not self._save_task.done():
+            self._flush_requested.set()
+            await self._save_task
+            self._flush_requested.clear()
+
+    def add_document(self, document_id: str, filename: str, chunks: List[Dict[str, Any]]) -> None:
+        """업로드된 문서의 청크 추가 (corpus_events 리스너, 임베딩이 없는 청크는 제외)"""
+        chunks = [chunk for chunk in chunks if chunk["embedding"] is not None]
+        if not self.ready or not chunks:
+            return
+        new_matrix = _normalize_rows(np.stack([np.asarray(chunk["embedding"], dtype=np.float32) for chunk in chunks]))
+        new_records = [
+            {
+                "id": chunk["id"],
+                "document_id": document_id,
+                "chunk_index": chunk["chunk_index"],
+                "metadata": chunk["metadata"],
+                "filename": filename
+            }
+            for chunk in chunks
+        ]
+
+        matrix = self._append_rows(new_matrix)
+        if self._ivf is not None:
+            centroids, assignments = self._ivf
+            self._ivf = (centroids, np.concatenate([assignments, self._assign(new_matrix, centroids)]))
+        self._records = self._records + new_records
+        self._document_ids = np.concatenate([self._document_ids, np.array([document_id] * len(chunks), dtype=object)])
+        self._alive = np.concatenate([self._alive, np.ones(len(chunks), dtype=bool)])
+        self._embeddings = matrix
+
+        self._maybe_build_ivf()
+        self._schedule_save()
+
+    def remove_document(self, document_id: str) -> None:
+        """삭제된 문서의 청크 제거 (corpus_events 리스너)"""
+        if not self.ready:
+            return
+        alive = self._alive & (self._document_ids != document_id)
+        self._alive = alive
+
+        dead = len(alive) - int(alive.sum())
+        if len(alive) and dead / len(alive) > COMPACT_RATIO:
+            matrix = np.asarray(self._embeddings)[alive]
+            records = [record for record, keep in zip(self._records, alive) if keep]
+            self._replace(matrix, records)
+            self._maybe_build_ivf()
+        self._schedule_save()
+
+    def _needs_ivf(self) -> bool:
+        """행 수가 임계값 이상이고 마지막 구성 이후 두 배 이상 늘었는지"""
+        rows = self._embeddings.shape[0]
+        return rows >= IN_MEMORY_IVF_THRESHOLD and rows >= 2 * self._ivf_built_rows
+
+    def _maybe_build_ivf(self) -> None:
+        """IVF 구조 재구성이 필요하면 백그라운드로 예약 (이미 구성 중이면 생략)"""
+        if not self._needs_ivf() or (self._ivf_task is not None and not self._ivf_task.done()):
+            return
+
+        async def build():
+            try:
+                await self._build_ivf()
+            except Exception as e:
+                logger.error(f"메모리 인덱스 IVF 구성 실패: {e}")
+
+        self._ivf_task = asyncio.get_running_loop().create_task(build())
+
+    async def _build_ivf(self) -> None:
+        """현재 행렬로 워커 스레드에서 IVF를 학습한 뒤 교체
+
+        학습 중 추가된 행은 새 중심점에 할당해 붙이고, 학습 중 행렬이 압축되어
+        행 번호가 바뀌었으면 결과를 버리고 다시 학습합니다.
+        """
+        while self._needs_ivf():
+            generation = self._generation
+            matrix = self._embeddings
+            rows = matrix.shape[0]
+            nlist = max(1, int(np.sqrt(rows)))
+            centroids, assignments = await run_blocking(self._train_ivf, matrix, nlist)
+            if generation != self._generation:
+                continue
+            if self._embeddings.shape[0] > rows:
+                assignments = np.concatenate([assignments, self._assign(self._embeddings[rows:], centroids)])
+            self._ivf = (centroids, assignments)
+            self._ivf_built_rows = rows
+            logger.info(f"메모리 인덱스 IVF 구성: {nlist}개 리스트, {rows}개 행")
+
+    @classmethod
+    def _train_ivf(cls, matrix: np.ndarray, nlist: int) -> Tuple[np.ndarray, np.ndarray]:
+        centroids = cls._kmeans(np.asarray(matrix), nlist)
+        return centroids, cls._assign(np.asarray(matrix), centroids)
+
+    @staticmethod
+    def _kmeans(matrix: np.ndarray, nlist: int, iterations: int = 10, sample_size: int = 100000) -> np.ndarray:
+        """코사인 거리 기반 k-means (표본으로 중심점 학습)"""
+        rng = np.random.default_rng(0)
+        sample = matrix[rng.choice(matrix.shape[0], min(sample_size, matrix.shape[0]), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)]
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(nlist):
+                members = sample[labels == i]
+                if len(members):
+                    centroids[i] = members.mean(axis=0)
+            centroids = _normalize_rows(centroids)
+        return centroids
+
+    @staticmethod
+    def _assign(matrix: np.ndarray, centroids: np.ndarray, batch_size: int = 50000) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(matrix[i:i + batch_size] @ centroids.T, axis=1)
+            for i in range(0, matrix.shape[0], batch_size)
+        ]).astype(np.int32) if matrix.shape[0] else np.zeros(0, dtype=np.int32)
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        top_k: int,
+        document_ids: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """코사인 유사도 top-k 검색 (반환 형식은 QAService의 DB 검색 결과와 동일)"""
+        # 동시 변경에 영향받지 않도록 현재 배열 참조를 고정
+        matrix, records, alive = self._embeddings, self._records, self._alive
+        document_column, ivf = self._document_ids, self._ivf
+        rows = min(matrix.shape[0], len(records), len(alive))
+        if rows == 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        mask = alive[:rows].copy()
+        if document_ids:
+            # 문서 필터가 있으면 IVF로 후보를 줄이지 않고 해당 문서의 행만 정확히 계산
+            # (가까운 리스트와 교집합을 취하면 작은 문서에서는 결과가 거의 남지 않음)
+            mask &= np.isin(document_column[:rows], document_ids)
+        elif ivf is not None and len(ivf[1]) >= rows:
+            centroids, assignments = ivf
+            nearest_lists = np.argsort(centroids @ query)[::-1][:IN_MEMORY_IVF_NPROBE]
+            mask &= np.isin(assignments[:rows], nearest_lists)
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return []
+
+        scores = np.asarray(matrix[candidates]) @ query
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            {**records[candidates[i]], "similarity_score": float(scores[i])}
+            for i in top
+        ]
+
+    @staticmethod
+    async def attach_content(chunks: List[Dict[str, Any]], db: AsyncSession) -> List[Dict[str, Any]]:
+        """검색 결과에 청크 본문을 DB에서 채움 (그 사이 삭제된 청크는 제외)"""
+        if not chunks:
+            return chunks
+        result = await db.execute(
+            text("SELECT id, content FROM document_chunks WHERE id = ANY(:ids)"),
+            {"ids": [chunk["id"] for chunk in chunks]}
+        )
+        contents = {str(row.id): row.content for row in result}
+        return [
+            {**chunk, "content": contents[chunk["id"]]}
+            for chunk in chunks
+            if chunk["id"] in contents
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": IN_MEMORY_INDEX,
+            "ready": self.ready,
+            "rows": self.size,
+            "dimension": int(self._embeddings.shape[1]) if self._embeddings.ndim == 2 else 0,
+            "ivf_lists": int(self._ivf[0].shape[0]) if self._ivf is not None else 0,
+            "memory_mapped": isinstance(self._embeddings, np.memmap)
+        }
+
+
+# 프로세스 전역 메모리 벡터 인덱스
+vector_index = InMemoryVectorIndex()